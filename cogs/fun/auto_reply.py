@@ -1,15 +1,36 @@
 import os
 import discord
+from cachetools import TTLCache
 from discord.ext import commands
-from utils.ai import generate_response
+from utils.ai import stream_response, PromptPrefix
+from utils.ai_usage import usage, BudgetMode, BudgetExceededError
+from utils.scheduler import scheduler, QueueFullError
+from utils.breaker import CircuitOpenError
+from utils.progressive import ProgressiveMessage
 from dotenv import load_dotenv
 
 load_dotenv()
+REPLY_CACHE_SIZE = 256
+REPLY_CACHE_SECONDS = int(os.getenv("REPLY_CACHE_SECONDS", "3600"))
 
 
 class AutoReplyCog(commands.Cog):
     def __init__(self, bot):
         self.bot = bot
+        # (tenant, message text) -> reply, reused for guilds that are low on Gemini budget
+        self.recent = TTLCache(maxsize=REPLY_CACHE_SIZE, ttl=REPLY_CACHE_SECONDS)
+        # REPLY_PROMPT is identical for every reply; Gemini keeps it cached and each request sends only the message
+        self.prefix = PromptPrefix(os.getenv("REPLY_PROMPT") or "", display_name="auto-reply")
+
+    async def cog_unload(self):
+        await self.prefix.close()
+
+    async def _stream_reply(self, prompt: str, channel, tenant: str) -> str:
+        # Reply is posted with the first chunk and grows in place
+        reply = ProgressiveMessage(send=channel.send)
+        async for chunk in stream_response(prompt, site="auto_reply", tenant=tenant, system=self.prefix):
+            await reply.append(chunk)
+        return await reply.finish()
 
     @commands.Cog.listener()
     async def on_message(self, message):
@@ -67,12 +88,23 @@ class AutoReplyCog(commands.Cog):
             else:
                 full_context = message.content
 
-            prompt = os.getenv("REPLY_PROMPT") + full_context
-
-            async with message.channel.typing():
-                reply = await generate_response(prompt)
+            prompt = full_context
 
-            await message.channel.send(reply)
+            tenant = str(message.guild.id) if message.guild else f"dm:{message.author.id}"
+            cache_key = (tenant, " ".join(full_context.casefold().split()))
+            cached = self.recent.get(cache_key)
+            if cached is not None and usage.mode(tenant) >= BudgetMode.PREFER_CACHE:
+                usage.note_degraded("cached")
+                await message.channel.send(cached)
+                return
+            try:
+                async with message.channel.typing():
+                    reply = await scheduler.run(tenant, self._stream_reply, prompt, message.channel, tenant)
+            except (QueueFullError, CircuitOpenError, BudgetExceededError):
+                # Busy server, Gemini down or budget spent; silently skip casual replies rather than spam a notice
+                return
+            if reply:
+                self.recent[cache_key] = reply
 
 async def setup(bot):
     await bot.add_cog(AutoReplyCog(bot))
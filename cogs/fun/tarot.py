@@ -13,9 +13,16 @@ MIDNIGHT = datetime.time(0, 0, tzinfo=IST)
 class Tarot(commands.Cog):
     def __init__(self, bot):
         self.bot = bot
-        self.store = TarotStore()
+        self.store = TarotStore(tzinfo=IST)
         self.daily_clear.start()
 
+    async def cog_load(self):
+        # One network call for the whole deck; draws are local afterwards
+        try:
+            await self.store.ensure_deck(self.bot.http_client)
+        except Exception as e:
+            print(f"[Tarot] Could not load deck yet: {e}")
+
     def cog_unload(self):
         # Stop task and close LMDB on unload
         self.daily_clear.cancel()
@@ -23,8 +30,8 @@ class Tarot(commands.Cog):
 
     @tasks.loop(time=MIDNIGHT)
     async def daily_clear(self):
-        # Clear all per-day entries at local midnight
-        self.store.clear_all()
+        # Drop yesterday's partition in one go at local midnight
+        self.store.rollover()
 
     @daily_clear.before_loop
     async def before_daily_clear(self):
@@ -38,7 +45,10 @@ class Tarot(commands.Cog):
 
         user_id = ctx.author.id
         try:
-            cards = self.store.get_or_create_today_cards(user_id, IST)
+            if not self.store.deck:
+                # Only reached if the deck could not be fetched at startup
+                await self.store.ensure_deck(self.bot.http_client)
+            cards = self.store.get_or_create_today_cards(user_id)
             await ctx.send(self._format_cards(ctx.author.mention, cards))
         except Exception as e:
             await ctx.send(f"Could not retrieve cards right now: {e}")
@@ -1,11 +1,13 @@
 import os
 import json
-import aiohttp
 from dotenv import load_dotenv
 from datetime import datetime, timedelta, timezone
 import discord
 from discord.ext import commands, tasks
 
+from utils.http_client import UpstreamError
+from utils.request_policy import fetch_json
+
 NASA_APOD_URL = "https://api.nasa.gov/planetary/apod"
 STATE_FILE = "global_cache/apod_state.json"
 
@@ -94,16 +96,16 @@ class Apod(commands.Cog):
     today = datetime.now(timezone.utc).date().isoformat()
     params = {"api_key": api_key, "date": today}
 
-    async with aiohttp.ClientSession() as session:
-      try:
-        async with session.get(NASA_APOD_URL, params=params, timeout=15) as resp:
-          if resp.status != 200:
-            print(f"[APOD] Error from NASA API: {resp.status} {await resp.text()}")
-            return None
-          return await resp.json()
-      except Exception as e:
-        print(f"[APOD] Exception while fetching APOD: {e}")
-        return None
+    try:
+      return await fetch_json(
+        self.bot.http_client, NASA_APOD_URL, params=params, upstream="nasa"
+      )
+    except UpstreamError as e:
+      print(f"[APOD] Error from NASA API: {e.status} {e.body}")
+      return None
+    except Exception as e:
+      print(f"[APOD] Exception while fetching APOD: {e}")
+      return None
 
 
 async def setup(bot: commands.Bot):
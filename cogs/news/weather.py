@@ -1,13 +1,92 @@
+import os
+import re
+import time
 import discord
+from cachetools import TTLCache
 from discord.ext import commands
 
 from utils.rate_limit import handle_rate_limit
-from utils.ai import generate_response
+from utils.ai import stream_response
+from utils.ai_usage import usage, BudgetMode, BudgetExceededError
+from utils.scheduler import scheduler, tenant_of, QueueFullError
+from utils.breaker import CircuitOpenError
+from utils.singleflight import SingleFlight
+from utils.progressive import ProgressiveMessage
+
+# --- Configuration ---
+WEATHER_BUCKET_SECONDS = int(os.getenv("WEATHER_BUCKET_SECONDS", "900"))  # one report per place per 15 min
+WEATHER_CACHE_SIZE = 512
+# Failures that belong to the leading guild (its own queue or budget), never to the requests coalesced onto it
+LEADER_ERRORS = (QueueFullError, BudgetExceededError)
+WEATHER_STALE_SECONDS = int(os.getenv("WEATHER_STALE_SECONDS", "10800"))  # older reports served to guilds low on budget
+
+# Common alternate names -> one cache entry
+LOCATION_ALIASES = {
+    "nyc": "new york",
+    "new york city": "new york",
+    "sf": "san francisco",
+    "la": "los angeles",
+    "bangalore": "bengaluru",
+    "blr": "bengaluru",
+    "bombay": "mumbai",
+    "calcutta": "kolkata",
+    "madras": "chennai",
+    "gurgaon": "gurugram",
+}
+
+
+def normalize_location(location: str) -> str:
+    """Case-fold, drop stray punctuation, collapse whitespace and resolve aliases."""
+    text = location.casefold().strip().strip(".!?")
+    text = re.sub(r"\s*,\s*", ", ", text)
+    text = re.sub(r"\s+", " ", text)
+    head, sep, rest = text.partition(",")
+    head = LOCATION_ALIASES.get(head.strip(), head.strip())
+    return head + sep + rest
 
 
 class Weather(commands.Cog):
     def __init__(self, bot):
         self.bot = bot
+        # (place, 15-min bucket, grounded) -> report; the TTL only bounds memory
+        self.reports = TTLCache(maxsize=WEATHER_CACHE_SIZE, ttl=WEATHER_BUCKET_SECONDS)
+        # (place, grounded) -> latest report, kept longer for guilds that are over their soft budget
+        self.latest = TTLCache(maxsize=WEATHER_CACHE_SIZE, ttl=WEATHER_STALE_SECONDS)
+        self.flight = SingleFlight()
+
+    async def _stream_report(self, prompt: str, status: discord.Message, tenant: str,
+                             grounded: bool) -> tuple[str, bool]:
+        """Stream the report into the status message as Gemini writes it; returns (report, grounded)."""
+        # The budget may have moved while queued; stream_response applies the same check without awaiting in between
+        grounded = grounded and usage.mode(tenant) < BudgetMode.NO_SEARCH
+        message = ProgressiveMessage(message=status)
+        async for chunk in stream_response(prompt, enable_search=grounded, site="weather", tenant=tenant):
+            await message.append(chunk)
+        report = await message.finish(fallback=None)
+        if not report:
+            # Raise rather than cache an empty answer for everyone asking about this place
+            raise RuntimeError("Gemini returned an empty weather report")
+        return report, grounded
+
+    async def _shared_report(self, key: tuple, tenant: str, prompt: str, status: discord.Message,
+                             grounded: bool) -> tuple[str, bool, bool]:
+        """
+        (report, grounded, streamed) through the single flight for `key`. A
+        follower whose leader fails for a reason of the leader's own guild
+        does not inherit it; it tries again, normally as the new leader.
+        """
+        while True:
+            leading = key not in self.flight
+            try:
+                # Identical requests in flight share one Gemini call; the
+                # leader streams into its own status message, waiters get the final text
+                report, grounded = await self.flight.do(
+                    key, scheduler.run, tenant, self._stream_report, prompt, status, tenant, grounded
+                )
+                return report, grounded, leading
+            except LEADER_ERRORS:
+                if leading:
+                    raise
 
     @commands.hybrid_command(name='weather')
     async def get_weather(self, ctx, *, location: str):
@@ -17,17 +96,19 @@ class Weather(commands.Cog):
         if len(location) > 100:
             return
 
-        await ctx.send("Fetching the latest weather report...")
+        status = await ctx.send("Fetching the latest weather report...")
         print(f"-> Received /weather request for: {location}")
 
+        # Built from the normalized place only: the report is cached and shown to everyone asking for it
+        place = normalize_location(location)
         prompt = f"""
 Act as a real-time weather reporter.
-Provide an up-to-date report for '{location.strip()}' using the location's local time now.
+Provide an up-to-date report for '{place}' using the location's local time now.
 Keep it around 90–110 words.
 
 Output exactly these labeled lines, with no code fences:
 
-Weather — {location.strip()}
+Weather — <the place's usual name, properly capitalised>
 • Now: <temp °C> (feels <feels °C>), <condition>; humidity <H%>, wind <S km/h> <dir>, gusts <G km/h>; precip <PoP%>.
 • AQI: <value> — <category> (0–50 Good, 51–100 Moderate, 101–150 Unhealthy for Sensitive Groups, 151–200 Unhealthy, 201–300 Very Unhealthy, 301–500 Hazardous); primary: <pollutant>; advice: <short guidance>.
 • Today: high <Hi °C>/low <Lo °C>; sunrise <time>, sunset <time>.
@@ -38,8 +119,45 @@ Notes:
 - Include the AQI category name per the standard scale above and one-line health advice.
 - If data is unavailable, state briefly which part is unavailable.
 """
-        reply = await generate_response(prompt)
-        await ctx.send(reply)
+        bucket = int(time.time() // WEATHER_BUCKET_SECONDS)
+        tenant = tenant_of(ctx)
+        mode = usage.mode(tenant)
+        grounded = mode < BudgetMode.NO_SEARCH
+        # Ungrounded reports (from guilds past their soft budget) never stand in for grounded ones
+        acceptable = (True,) if grounded else (True, False)
+        streamed = False
+        try:
+            reply = next((r for g in acceptable if (r := self.reports.get((place, bucket, g))) is not None), None)
+            if reply is None and mode >= BudgetMode.PREFER_CACHE:
+                # An older report beats another paid call for a guild near its budget
+                reply = next((r for g in acceptable if (r := self.latest.get((place, g))) is not None), None)
+                if reply is not None:
+                    usage.note_degraded("cached")
+            if reply is None and mode >= BudgetMode.REFUSE:
+                # Never lead (or wait on) a flight this guild couldn't pay for
+                usage.note_degraded("refused")
+                raise BudgetExceededError("this server has used up today's AI budget")
+            if reply is None:
+                reply, grounded, streamed = await self._shared_report(
+                    (place, bucket, grounded), tenant, prompt, status, grounded
+                )
+                self.reports[(place, bucket, grounded)] = reply
+                self.latest[(place, grounded)] = reply
+        except BudgetExceededError as e:
+            await ctx.send(f"💸 Weather service: {e}. Please try again tomorrow.")
+            return
+        except QueueFullError as e:
+            await ctx.send(f"⏳ {e} Please try again in a moment.")
+            return
+        except CircuitOpenError as e:
+            await ctx.send(f"⚡ Weather service: {e}.")
+            return
+        except Exception as e:
+            print(f"[Weather unexpected error] {type(e).__name__}: {e}")
+            await ctx.send("Could not fetch the weather right now. Please try again later.")
+            return
+        if not streamed:
+            await status.edit(content=reply)
 
 async def setup(bot):
     await bot.add_cog(Weather(bot))
@@ -1,175 +1,183 @@
+import os
+import re
 import asyncio
-import socket
-import ipaddress
 import contextlib
-from urllib.parse import urlparse
 
 import discord
 from discord.ext import commands
 
 from utils.rate_limit import handle_rate_limit
+from utils.latency import latency
+from utils.probe import ProbeError, parse_target, probe
+
+PING_MAX_COUNT = int(os.getenv("PING_MAX_COUNT", "20"))
+PING_BATCH_MAX = int(os.getenv("PING_BATCH_MAX", "25"))
+PING_BATCH_CONCURRENCY = int(os.getenv("PING_BATCH_CONCURRENCY", "10"))
+BATCH_ATTACHMENT_MAX = 64 * 1024
+BATCH_EDIT_SECONDS = 1.0  # message edits are rate limited by Discord too
 
 
 class Ping(commands.Cog):
     def __init__(self, bot: commands.Bot):
         self.bot = bot
 
-    async def _detect_proxy(self, host: str, reader: asyncio.StreamReader) -> str | None:
-        """
-        Best-effort detection of a common HTTP reverse proxy/CDN.
-        Currently detects Cloudflare via response headers.
-        """
-        try:
-            # Read up to first 4 KiB of the HTTP response
-            data = await asyncio.wait_for(reader.read(4096), timeout=3.0)
-        except Exception:
-            return None
-
-        headers = data.decode(errors="ignore").lower()
-
-        # Very simple Cloudflare detection heuristics
-        if "server: cloudflare" in headers or "cf-ray:" in headers or "cf-cache-status:" in headers:
-            return "Cloudflare"
-
-        # You could add more CDNs here based on their `Server` or custom headers.
-        return None
-
-    @commands.hybrid_command(name="ping")
-    async def ping_site(self, ctx: commands.Context, *, target: str):
+    @commands.hybrid_group(name="ping", fallback="check", invoke_without_command=True)
+    async def ping_site(self, ctx: commands.Context, target: str, count: commands.Range[int, 1, PING_MAX_COUNT] = 1):
         """
         Checks if a host is reachable and shows its IP/latency,
         and (best-effort) whether a proxy like Cloudflare is in front.
+        With count > 1, takes that many samples per address family and
+        reports min/avg/p95/stddev and loss; IPv4 and IPv6 are raced.
         """
         if not await handle_rate_limit(ctx):
             return
 
-        raw_input = target.strip()
-
-        # Normalise to a URL so urlparse works
-        if not raw_input.startswith(("http://", "https://")):
-            url = "https://" + raw_input
-        else:
-            url = raw_input
+        parsed = parse_target(target)
+        if parsed is None:
+            await ctx.send("Could not parse a valid hostname from your input.")
+            return
+        host, port, tls = parsed
 
-        parsed = urlparse(url)
+        samples_note = f", {count} samples" if count > 1 else ""
+        await ctx.send(f"🔍 Resolving and pinging `{host}` (port {port}{samples_note})...")
+        print(f"-> Received /ping request for: {target} -> host={host}, port={port}, count={count}")
 
-        host = parsed.hostname
-        port = parsed.port
+        try:
+            result = await probe(host, port, count, tls=tls)
+        except ProbeError as e:
+            await ctx.send(str(e))
+            return
 
-        # Default ports if none provided
-        if port is None:
-            if parsed.scheme == "http":
-                port = 80
+        ips, summaries, best = result["ips"], result["summaries"], result["best"]
+        if best is None:
+            if result["timed_out"]:
+                await ctx.send(
+                    f"❌ `{host}` ({', '.join(ips)}:{port}) appears to be **DOWN** or not accepting TCP connections.\n"
+                    f"- Reason: connection **timed out** after {latency.timeout(f'ping:{host}'):.1f} seconds."
+                )
             else:
-                port = 443
-
-        if not host:
-            await ctx.send("Could not parse a valid hostname from your input.")
+                await ctx.send(
+                    f"⚠️ `{host}` resolved to `{', '.join(ips)}`, but the TCP connection failed.\n"
+                )
             return
 
-        await ctx.send(f"🔍 Resolving and pinging `{host}` (port {port})...")
-        print(f"-> Received /ping request for: {raw_input} -> host={host}, port={port}")
-
-        try:
-            loop = asyncio.get_running_loop()
-            addrinfo = await loop.getaddrinfo(
-                host,
-                port,
-                type=socket.SOCK_STREAM,
+        msg_lines = [
+            "✅ Host **UP**",
+            f"- Hostname: `{host}`",
+            f"- Port: `{port}`",
+        ]
+        for ip in ips:
+            family = "IPv6" if ":" in ip else "IPv4"
+            stats = summaries[ip]
+            if not stats["received"]:
+                msg_lines.append(f"- {family} `{ip}`: no response ({stats['sent']}/{stats['sent']} lost)")
+            elif count == 1:
+                msg_lines.append(f"- {family} `{ip}`: `{stats['min']:.1f} ms` (TCP connect)")
+            else:
+                msg_lines.append(
+                    f"- {family} `{ip}`: min/avg/p95/stddev = "
+                    f"`{stats['min']:.1f}/{stats['avg']:.1f}/{stats['p95']:.1f}/{stats['stddev']:.1f} ms`, "
+                    f"loss {stats['loss']:.0%} ({stats['sent'] - stats['received']}/{stats['sent']})"
+                )
+        reachable = [ip for ip in ips if summaries[ip]["received"]]
+        if len(reachable) > 1:
+            other = next(ip for ip in reachable if ip != best)
+            gap = summaries[other]["median"] - summaries[best]["median"]
+            msg_lines.append(f"- Faster family: **{'IPv6' if ':' in best else 'IPv4'}** (by {gap:.1f} ms median)")
+
+        phases = result["phases"]
+        parts = [f"DNS `{result['dns_ms']:.1f}`" + (" (cached)" if result["dns_cached"] else "")]
+        for label, key in (("TCP", "tcp_ms"), ("TLS", "tls_ms"), ("TTFB", "ttfb_ms")):
+            if phases[key] is not None:
+                parts.append(f"{label} `{phases[key]:.1f}`")
+        msg_lines.append(f"- Phases (ms): {' • '.join(parts)}")
+        if phases["error"]:
+            msg_lines.append(f"- ⚠️ {'HTTPS' if tls else 'HTTP'} check: {phases['error']}")
+
+        if result["proxy"]:
+            msg_lines.append(
+                f"- Edge/Proxy: `{result['proxy']}` (you are hitting the CDN/proxy, not the origin directly)"
             )
 
-            if not addrinfo:
-                await ctx.send(f"❌ Could not resolve hostname `{host}`.")
-                return
+        await ctx.send("\n".join(msg_lines))
 
-            family, socktype, proto, canonname, sockaddr = addrinfo[0]
-            ip_address, resolved_port = sockaddr[0], sockaddr[1]
+    @ping_site.command(name="batch")
+    async def ping_batch(self, ctx: commands.Context, attachment: discord.Attachment | None = None, *, targets: str = ""):
+        """
+        Ping many hosts at once; results stream into one message as they finish.
 
-        except socket.gaierror as e:
-            print(e)
-            await ctx.send(f"❌ DNS resolution failed for `{host}`")
-            return
-        except Exception as e:
-            print(e)
-            await ctx.send(f"❌ Unexpected error while resolving `{host}`")
+        Usage:
+          /ping batch example.com api.example.com:8443 http://status.example.org
+          /ping batch   (with a .txt attachment, one host per line)
+        """
+        if not await handle_rate_limit(ctx):
             return
 
-        try:
-            ip_obj = ipaddress.ip_address(ip_address)
-            if (
-                ip_obj.is_loopback
-                or ip_obj.is_private
-                or ip_obj.is_link_local
-                or ip_obj.is_reserved
-                or ip_obj.is_multicast
-            ):
-                await ctx.send("❌ Target IP address not allowed.") # (private, loopback, or reserved addresses)
+        text = targets
+        if attachment is not None:
+            if attachment.size > BATCH_ATTACHMENT_MAX:
+                await ctx.send(f"Attachment is too large (max {BATCH_ATTACHMENT_MAX // 1024} KB).")
                 return
-        except ValueError:
-            await ctx.send("❌ Failed to parse the resolved IP address.")
-            return
+            text += "\n" + (await attachment.read()).decode("utf-8", errors="ignore")
 
-        # Try to open a TCP connection as a "ping"
-        try:
-            start = loop.time()
-
-            connect_coro = asyncio.open_connection(ip_address, port)
-            reader, writer = await asyncio.wait_for(connect_coro, timeout=5.0)
-
-            latency_ms = (loop.time() - start) * 1000
-
-            # Send a tiny HTTP request so we can inspect headers
-            http_request = (
-                f"HEAD / HTTP/1.1\r\n"
-                f"Host: {host}\r\n"
-                f"Connection: close\r\n"
-                f"\r\n"
-            ).encode("ascii", errors="ignore")
-
-            try:
-                writer.write(http_request)
-                await writer.drain()
-            except Exception:
-                # If this fails, we still have the TCP latency
-                pass
-
-            proxy_name = await self._detect_proxy(host, reader)
-
-            # Cleanly close connection
-            writer.close()
-            with contextlib.suppress(Exception):
-                await writer.wait_closed()
-
-            msg_lines = [
-                "✅ Host **UP**",
-                f"- Hostname: `{host}`",
-                f"- IP: `{ip_address}`",
-                f"- Port: `{port}`",
-                f"- Latency: `{latency_ms:.1f} ms` (TCP connect)",
-            ]
-
-            if proxy_name:
-                msg_lines.append(
-                    f"- Edge/Proxy: `{proxy_name}` (you are hitting the CDN/proxy, not the origin directly)"
-                )
+        endpoints = []
+        for token in dict.fromkeys(t for t in re.split(r"[\s,]+", text) if t):
+            parsed = parse_target(token)
+            if parsed is not None and parsed[:2] not in [e[:2] for e in endpoints]:
+                endpoints.append(parsed)
 
-            await ctx.send("\n".join(msg_lines))
+        if not endpoints:
+            await ctx.send("No hosts found. List them after the command or attach a text file.")
+            return
+        if len(endpoints) > PING_BATCH_MAX:
+            await ctx.send(f"Please ping at most {PING_BATCH_MAX} hosts at a time.")
+            return
 
-        except asyncio.TimeoutError:
-            await ctx.send(
-                f"❌ `{host}` ({ip_address}:{port}) appears to be **DOWN** or not accepting TCP connections.\n"
-                f"- Reason: connection **timed out** after 5 seconds."
-            )
-        except (ConnectionRefusedError, OSError) as e:
-            print(e)
-            await ctx.send(
-                f"⚠️ `{host}` resolved to `{ip_address}`, but the TCP connection failed.\n"
-            )
-        except Exception as e:
-            print(e)
-            await ctx.send(
-                f"❌ Unexpected error while pinging `{host}` ({ip_address}:{port}).\n"
-            )
+        print(f"-> Received /ping batch request: {len(endpoints)} hosts")
+        header = f"## Ping batch ({len(endpoints)} hosts)"
+        status = await ctx.send(f"{header}\n🔍 Probing...")
+
+        semaphore = asyncio.Semaphore(PING_BATCH_CONCURRENCY)
+        lines: list[str] = []
+        loop = asyncio.get_running_loop()
+        last_edit = loop.time()
+
+        def render(done: bool) -> str:
+            footer = "" if done else f"\n🔍 {len(lines)}/{len(endpoints)} done..."
+            body = "\n".join(lines)
+            if len(header) + len(body) + len(footer) > 1950:
+                body = body[:1950 - len(header) - len(footer) - 20] + "\n...(truncated)..."
+            return f"{header}\n{body}{footer}"
+
+        async def run(host: str, port: int, tls: bool):
+            nonlocal last_edit
+            async with semaphore:
+                try:
+                    result = await probe(host, port, tls=tls)
+                except ProbeError as e:
+                    line = f"{e} (`{host}:{port}`)"
+                except Exception as e:
+                    print(f"[Ping batch error] {host}: {type(e).__name__}: {e}")
+                    line = f"❌ `{host}:{port}`: unexpected error"
+                else:
+                    best = result["best"]
+                    if best is None:
+                        reason = "timed out" if result["timed_out"] else "connection failed"
+                        line = f"❌ `{host}:{port}`: {reason}"
+                    else:
+                        line = f"✅ `{host}:{port}`: {result['summaries'][best]['min']:.1f} ms ({best})"
+                        if result["proxy"]:
+                            line += f" via {result['proxy']}"
+            lines.append(line)
+
+            now = loop.time()
+            if now - last_edit >= BATCH_EDIT_SECONDS:
+                last_edit = now
+                with contextlib.suppress(discord.HTTPException):
+                    await status.edit(content=render(done=False))
+
+        await asyncio.gather(*(run(*endpoint) for endpoint in endpoints))
+        await status.edit(content=render(done=True))
 
 
 async def setup(bot: commands.Bot):
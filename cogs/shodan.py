@@ -1,32 +1,53 @@
 import os
+import re
 import asyncio
+import ipaddress
+from collections import Counter
+import tempfile
+from typing import Literal, Optional
+
 import discord
 from discord.ext import commands
 from dotenv import load_dotenv
 import shodan
 
 from utils.rate_limit import handle_rate_limit
+from utils.scheduler import scheduler, tenant_of, QueueFullError
+from utils.breaker import CircuitOpenError
+from utils.shodan_api.client import AsyncShodan
+from utils.shodan_api.cache import ShodanCache, normalize_query
+from utils.shodan_api.export import ResultWriter
+from utils.shodan_api.pager import ResultPager, slim_match
 
 # --- Configuration ---
 load_dotenv()
 SHODAN_API_KEY = os.getenv("SHODAN_API_KEY")
+SUMMARY_FACETS = ("port", "country", "org", "product")
+SUMMARY_TOP = 5  # rows per facet
+SHODAN_EXPORT_MAX = int(os.getenv("SHODAN_EXPORT_MAX", "1000"))  # every 100 rows after the first cost a credit
+SHODAN_HOST_MAX = int(os.getenv("SHODAN_HOST_MAX", "10"))  # IPs per /shodan host
 
 
 class ShodanCog(commands.Cog):
     def __init__(self, bot: commands.Bot):
         self.bot = bot
-        self.shodan = shodan.Shodan(SHODAN_API_KEY) if SHODAN_API_KEY else None
+        self.shodan = AsyncShodan(bot.http_client, SHODAN_API_KEY) if SHODAN_API_KEY else None
+        self.cache = ShodanCache()
+
+    def cog_unload(self):
+        self.cache.close()
 
-    @commands.hybrid_command(name="shodan")
+    @commands.hybrid_group(name="shodan", fallback="search", invoke_without_command=True)
     async def shodan_search(self, ctx: commands.Context, *, query: str):
-        limit = 5
         """
         Search Shodan for internet-facing devices matching a query.
+        Results are shown one host at a time with Prev/Next buttons.
 
         Usage:
           /shodan apache country:US
-          /shodan 10 nginx port:80
-        Where "10" is the max number of results (1–20).
+          /shodan summary nginx country:DE   # distributions only, no credits
+          /shodan export csv nginx port:80     # file with up to SHODAN_EXPORT_MAX rows
+          /shodan host 1.1.1.1 8.8.8.8         # host records for specific IPs
         """
         if not await handle_rate_limit(ctx):
             return
@@ -35,23 +56,16 @@ class ShodanCog(commands.Cog):
             await ctx.send("Shodan API key is not configured on the bot.")
             return
 
-        if limit < 1 or limit > 20:
-            await ctx.send("Please provide a result limit between 1 and 20.")
-            return
-
         if len(query) > 200:
             await ctx.send("Please use a shorter query (max 200 characters).")
             return
 
-        print(f"-> Received /shodan request: limit={limit}, query={query}")
+        print(f"-> Received /shodan request: query={query}")
 
+        tenant = tenant_of(ctx)
         try:
             async with ctx.typing():
-                loop = asyncio.get_running_loop()
-                results = await loop.run_in_executor(
-                    None,
-                    lambda: self.shodan.search(query, limit=limit)
-                )
+                results, age = await self._search_page(tenant, query, 1)
 
             total = results.get("total", 0)
             matches = results.get("matches", [])
@@ -60,86 +74,262 @@ class ShodanCog(commands.Cog):
                 await ctx.send(f"No Shodan results for `{query}`.")
                 return
 
-            # Header
-            lines = [
-                f"## Shodan search results",
-                f"Query: `{query}`",
-                f"Showing {len(matches)} of ~{total:,} matches.",
-                "",
-            ]
-
-            for idx, match in enumerate(matches, start=1):
-                ip_str = match.get("ip_str", "unknown IP")
-                port = match.get("port", "?")
-                transport = match.get("transport")
-                if transport:
-                    transport = transport.upper()
-
-                org = match.get("org") or "N/A"
-                asn = match.get("asn") or "N/A"
-
-                location = match.get("location") or {}
-                country = location.get("country_name") or "N/A"
-                city = location.get("city") or "Unknown city"
-
-                os_name = match.get("os") or "Unknown OS"
-                hostnames_list = match.get("hostnames") or []
-                hostnames = ", ".join(hostnames_list[:3]) if hostnames_list else "None"
-
-                product = match.get("product") or "Unknown service"
-                version = match.get("version")
-                product_str = product + (f" {version}" if version else "")
-
-                tags_list = match.get("tags") or []
-                tags = ", ".join(tags_list[:5]) if tags_list else "None"
-
-                timestamp = (
-                    match.get("timestamp")
-                    or match.get("updated")
-                    or "N/A"
+            async def fetch_page(page: int):
+                data, _age = await self._search_page(tenant, query, page)
+                return data.get("matches", [])
+
+            pager = ResultPager(query, matches, total, fetch_page, ctx.author.id)
+            content = f"_Cached result from {int(age // 60)} min ago._" if age >= 60 else None
+            pager.message = await ctx.send(content=content, embed=pager.current_embed(), view=pager)
+
+        except Exception as e:
+            await self._send_error(ctx, e)
+
+    async def _search_page(self, tenant: str, query: str, page: int):
+        """One 100-match search page, slimmed and cached; returns (results, age_seconds)."""
+        async def loader():
+            # Only a miss (or a background refresh) spends query credits
+            data = await scheduler.run(tenant, self.shodan.search, query, page=page)
+            return {"total": data.get("total", 0), "matches": [slim_match(m) for m in data.get("matches", [])]}
+
+        return await self.cache.get_or_fetch("search", f"{normalize_query(query)}|page={page}", loader)
+
+    @shodan_search.command(name="summary")
+    async def shodan_summary(self, ctx: commands.Context, *, query: str):
+        """
+        Top ports, countries, orgs and products for a query, from Shodan's
+        facet counts. Counting spends no query credits.
+
+        Usage:
+          /shodan summary nginx country:DE
+        """
+        if not await handle_rate_limit(ctx):
+            return
+
+        if not self.shodan:
+            await ctx.send("Shodan API key is not configured on the bot.")
+            return
+
+        if len(query) > 200:
+            await ctx.send("Please use a shorter query (max 200 characters).")
+            return
+
+        print(f"-> Received /shodan summary request: query={query}")
+
+        facets = ",".join(f"{name}:{SUMMARY_TOP}" for name in SUMMARY_FACETS)
+        tenant = tenant_of(ctx)
+
+        def loader():
+            return scheduler.run(tenant, self.shodan.count, query, facets=facets)
+
+        try:
+            async with ctx.typing():
+                results, age = await self.cache.get_or_fetch(
+                    "count", f"{normalize_query(query)}|facets={facets}", loader
                 )
+        except Exception as e:
+            await self._send_error(ctx, e)
+            return
 
-                vulns = match.get("vulns") or {}
-                vuln_keys = list(vulns.keys())[:3] if isinstance(vulns, dict) else []
-                vulns_str = ", ".join(vuln_keys) if vuln_keys else "None"
+        total = results.get("total", 0)
+        if not total:
+            await ctx.send(f"No Shodan results for `{query}`.")
+            return
 
-                banner = match.get("data") or ""
-                banner_snippet = ""
-                if banner:
-                    first_line = banner.strip().splitlines()[0]
-                    banner_snippet = first_line[:140]
-                    banner_snippet = banner_snippet.replace("`", "´")
+        lines = [
+            "## Shodan summary",
+            f"Query: `{query}`",
+            f"~{total:,} matching services.",
+        ]
+        if age >= 60:
+            lines.append(f"_Cached result from {int(age // 60)} min ago._")
+
+        facet_data = results.get("facets") or {}
+        for name in SUMMARY_FACETS:
+            rows = facet_data.get(name) or []
+            if not rows:
+                continue
+            width = max(len(str(row.get("value"))[:28]) for row in rows)
+            table = [f"{str(row.get('value'))[:28]:<{width}}  {row.get('count', 0):>10,}" for row in rows]
+            lines.append(f"**{name.capitalize()}**")
+            lines.append("```\n" + "\n".join(table) + "\n```")
+
+        message = "\n".join(lines)
+        if len(message) > 2000:
+            message = message[:1990] + "\n...(truncated)..."
+        await ctx.send(message)
+
+    @shodan_search.command(name="export")
+    async def shodan_export(self, ctx: commands.Context, fmt: Optional[Literal["xlsx", "csv"]] = None, *, query: str):
+        """
+        Export search results to an XLSX (default) or CSV attachment. Pages are
+        fetched one at a time and each is written straight to disk off the
+        event loop, so memory stays flat up to the row cap.
 
-                # Per‑host block
-                header_parts = [f"[{idx}] `{ip_str}:{port}`"]
-                if transport:
-                    header_parts.append(transport)
-                header_line = " ".join(header_parts)
+        Usage:
+          /shodan export nginx port:80
+          /shodan export csv nginx port:80
+        """
+        if not await handle_rate_limit(ctx):
+            return
+
+        if not self.shodan:
+            await ctx.send("Shodan API key is not configured on the bot.")
+            return
+
+        if len(query) > 200:
+            await ctx.send("Please use a shorter query (max 200 characters).")
+            return
+
+        fmt = fmt or "xlsx"
+        print(f"-> Received /shodan export request: fmt={fmt}, query={query}")
+        status = await ctx.send(f"📦 Exporting `{query}`: fetching the first page...")
+
+        fd, path = tempfile.mkstemp(prefix="shodan_export_", suffix=f".{fmt}")
+        os.close(fd)
+        try:
+            try:
+                rows, total = await scheduler.run(tenant_of(ctx), self._export, query, fmt, path, status)
+            except Exception as e:
+                await status.delete()
+                await self._send_error(ctx, e)
+                return
+
+            if not rows:
+                await status.edit(content=f"No Shodan results for `{query}`.")
+                return
+
+            limit = ctx.guild.filesize_limit if ctx.guild else discord.utils.DEFAULT_FILE_SIZE_LIMIT_BYTES
+            if os.path.getsize(path) > limit:
+                await status.edit(content="The export is larger than Discord's upload limit here. Try a narrower query.")
+                return
 
-                lines.append(header_line)
-                lines.append(f"- Service: {product_str}")
-                lines.append(f"- Location: {city}, {country}")
-                lines.append(f"- Org/ASN: {org} / {asn}")
-                lines.append(f"- OS: {os_name}")
-                lines.append(f"- Hostnames: {hostnames}")
-                lines.append(f"- Tags: {tags}")
-                lines.append(f"- Vulns: {vulns_str}")
-                lines.append(f"- Last seen: {timestamp}")
+            await status.edit(content=f"✅ Exported {rows:,} of ~{total:,} matches for `{query}`.")
+            await ctx.send(file=discord.File(path, filename=f"shodan_export.{fmt}"))
+        finally:
+            os.remove(path)
 
-                if banner_snippet:
-                    lines.append(f"- Banner: `{banner_snippet}`")
+    async def _export(self, query: str, fmt: str, path: str, status) -> tuple[int, int]:
+        loop = asyncio.get_running_loop()
+        writer = await loop.run_in_executor(None, ResultWriter, path, fmt)
+        total = 0
+        try:
+            async for total, matches in self.shodan.search_cursor(query, SHODAN_EXPORT_MAX):
+                await loop.run_in_executor(None, writer.write_matches, matches)
+                await status.edit(content=(
+                    f"📦 Exporting `{query}`: {writer.rows:,}/{min(total, SHODAN_EXPORT_MAX):,} rows written..."
+                ))
+        finally:
+            await loop.run_in_executor(None, writer.close)
+        return writer.rows, total
+
+    @shodan_search.command(name="host")
+    async def shodan_host(self, ctx: commands.Context, *, ips: str):
+        """
+        Open ports, vulns and org for one or more IPs, looked up concurrently.
+        Host records are cached per IP, so repeat lookups are instant.
 
-                lines.append("")  # blank line between hosts
+        Usage:
+          /shodan host 1.1.1.1
+          /shodan host 1.1.1.1 8.8.8.8, 9.9.9.9
+        """
+        if not await handle_rate_limit(ctx):
+            return
+
+        if not self.shodan:
+            await ctx.send("Shodan API key is not configured on the bot.")
+            return
 
-            message = "\n".join(lines)
+        targets, rejected = [], []
+        for token in dict.fromkeys(re.split(r"[\s,]+", ips.strip())):
+            if not token:
+                continue
+            try:
+                ip = ipaddress.ip_address(token)
+            except ValueError:
+                rejected.append(token)
+                continue
+            if not ip.is_global:
+                rejected.append(token)  # Shodan only scans public addresses
+                continue
+            targets.append(str(ip))
+
+        if not targets:
+            await ctx.send("Please provide one or more public IP addresses.")
+            return
+        if len(targets) > SHODAN_HOST_MAX:
+            await ctx.send(f"Please look up at most {SHODAN_HOST_MAX} IPs at a time.")
+            return
 
-            # Keep under Discord's 2000-character limit for a single message
-            if len(message) > 2000:
-                message = message[:1990] + "\n...(truncated)..."
+        print(f"-> Received /shodan host request: {len(targets)} IPs")
 
-            await ctx.send(message)
+        try:
+            async with ctx.typing():
+                # One scheduler slot for the batch so the lookups really run side by side
+                hosts = await scheduler.run(tenant_of(ctx), self._lookup_hosts, targets)
+        except Exception as e:
+            await self._send_error(ctx, e)
+            return
 
-        except shodan.APIError as e:
+        found = {ip: h for ip, h in hosts.items() if not isinstance(h, Exception)}
+        lines = ["## Shodan host lookup"]
+        if len(found) > 1:
+            port_counts = Counter(port for h in found.values() for port in h.get("ports", []))
+            all_vulns = {v for h in found.values() for v in h.get("vulns", [])}
+            top_ports = ", ".join(f"{p}×{n}" if n > 1 else str(p) for p, n in port_counts.most_common(10))
+            lines.append(f"{len(found)} hosts • ports: {top_ports or 'none'} • {len(all_vulns)} distinct vulns")
+        lines.append("")
+
+        for ip in targets:
+            host = hosts[ip]
+            if isinstance(host, Exception):
+                lines.append(f"• `{ip}`: {host if isinstance(host, shodan.APIError) else 'lookup failed'}")
+                continue
+            ports = ", ".join(str(p) for p in sorted(host.get("ports", []))) or "none"
+            vulns = sorted(host.get("vulns", []))
+            vulns_str = (", ".join(vulns[:3]) + (f" (+{len(vulns) - 3})" if len(vulns) > 3 else "")) if vulns else "None"
+            lines.append(f"• `{ip}`: {host.get('org') or 'N/A'} ({host.get('country_name') or 'N/A'})")
+            lines.append(f"  - Ports: {ports}")
+            lines.append(f"  - Vulns: {vulns_str}")
+            if host.get("hostnames"):
+                lines.append(f"  - Hostnames: {', '.join(host['hostnames'][:3])}")
+
+        if rejected:
+            lines.append("")
+            lines.append(f"Skipped (not a public IP): {', '.join(f'`{t}`' for t in rejected[:10])}")
+
+        message = "\n".join(lines)
+        if len(message) > 2000:
+            message = message[:1990] + "\n...(truncated)..."
+        await ctx.send(message)
+
+    async def _lookup_hosts(self, ips: list[str]) -> dict:
+        """Concurrent host() lookups; per-IP failures come back as exceptions, not raised."""
+        async def lookup(ip: str):
+            async def loader():
+                host = await self.shodan.host(ip)
+                keep = ("ports", "vulns", "org", "isp", "asn", "country_name", "city", "hostnames", "os", "last_update")
+                return {k: host.get(k) for k in keep if host.get(k) is not None}
+
+            data, _age = await self.cache.get_or_fetch("host", ip, loader)
+            return data
+
+        results = await asyncio.gather(*(lookup(ip) for ip in ips), return_exceptions=True)
+        for ip, result in zip(ips, results):
+            if isinstance(result, (QueueFullError, CircuitOpenError)):
+                raise result
+            if isinstance(result, Exception) and not isinstance(result, shodan.APIError):
+                print(f"[Shodan host error] {ip}: {type(result).__name__}: {result}")
+        return dict(zip(ips, results))
+
+    async def _send_error(self, ctx: commands.Context, e: Exception):
+        if isinstance(e, QueueFullError):
+            await ctx.send(f"⏳ {e} Please try again in a moment.")
+
+        elif isinstance(e, CircuitOpenError):
+            await ctx.send(f"⚡ Upstream {e}.")
+
+        elif isinstance(e, shodan.APIError):
             error_msg = str(e)
             print(f"[Shodan APIError] {error_msg}")
 
@@ -158,13 +348,12 @@ class ShodanCog(commands.Cog):
 
             await ctx.send(friendly)
 
-        except Exception as e:
+        else:
             print(f"[Shodan unexpected error] {type(e).__name__}: {e}")
             await ctx.send(
                 "Unexpected error while querying Shodan. "
                 "Check bot logs for details."
             )
 
-
 async def setup(bot: commands.Bot):
     await bot.add_cog(ShodanCog(bot))
@@ -0,0 +1,32 @@
+from discord.ext import commands
+
+from utils import metrics
+from utils.rate_limit import handle_rate_limit
+
+
+class Stats(commands.Cog):
+    def __init__(self, bot):
+        self.bot = bot
+
+    @commands.hybrid_command(name='stats', description="Shows internal bot metrics")
+    async def show_stats(self, ctx, section: str | None = None):
+        """Shows scheduler queue depths and other internal metrics."""
+        if not await handle_rate_limit(ctx):
+            return
+
+        data = metrics.snapshot()
+        if section:
+            if section not in data:
+                await ctx.send(f"Unknown section. Available: {', '.join(data) or 'none'}")
+                return
+            data = {section: data[section]}
+
+        body = "\n".join(metrics.render(data)) or "No metrics registered."
+        if len(body) > 1900:
+            body = body[:1900] + "\n...(truncated)..."
+
+        await ctx.send(f"```yaml\n{body}\n```")
+
+
+async def setup(bot):
+    await bot.add_cog(Stats(bot))
@@ -1,62 +1,37 @@
+import io
 import os
+import re
+import csv
 import asyncio
-import requests
 from datetime import datetime
-from dotenv import load_dotenv
 
 import discord
-from discord.ext import commands
+from discord.ext import commands, tasks
 
 from utils.rate_limit import handle_rate_limit
-
-load_dotenv()
-
-ETHERSCAN_API_KEY = os.getenv("ETHERSCAN_API_KEY")
-BASE_URL = "https://api.etherscan.io/v2/api"
-CHAIN_ID = 1  # Ethereum mainnet
-
-
-def fetch_latest_normal_txs(address: str, limit: int = 9):
-    params = {
-        "chainid": CHAIN_ID,
-        "module": "account",
-        "action": "txlist",
-        "address": address,
-        "startblock": 0,
-        "endblock": 99999999,
-        "page": 1,
-        "offset": limit,
-        "sort": "desc",
-        "apikey": ETHERSCAN_API_KEY,
-    }
-    resp = requests.get(BASE_URL, params=params, timeout=10)
-    data = resp.json()
-    if data.get("status") != "1" or not isinstance(data.get("result"), list):
-        print("Normal txs API problem:", data.get("message"), data.get("result"))
-        return []
-    return data["result"]
-
-
-def fetch_latest_internal_txs(address: str, limit: int = 9):
-    params = {
-        "chainid": CHAIN_ID,
-        "module": "account",
-        "action": "txlistinternal",
-        "address": address,
-        "startblock": 0,
-        "endblock": 99999999,
-        "page": 1,
-        "offset": limit,
-        "sort": "desc",
-        "apikey": ETHERSCAN_API_KEY,
-    }
-    resp = requests.get(BASE_URL, params=params, timeout=10)
-    data = resp.json()
-    if data.get("status") != "1" or not isinstance(data.get("result"), list):
-        print("Internal txs API problem:", data.get("message"), data.get("result"))
-        return []
-    return data["result"]
-
+from utils.scheduler import scheduler, tenant_of, QueueFullError
+from utils.breaker import CircuitOpenError
+from utils.etherscan.api import (
+    ETHERSCAN_API_KEY, EtherscanError, iter_tx_pages, fetch_block_number, fetch_block_addresses,
+)
+from utils.etherscan.tx_cache import TxCache
+from utils.etherscan.watchlist import WatchList
+from utils.etherscan.window_join import InternalIndex
+
+TRAP_THRESHOLD = 3  # more matching pairs than this flags a wallet
+DEEP_MAX_TXS = 50000
+DEEP_PAGE_SIZE = 1000
+TRAP_BULK_MAX = int(os.getenv("TRAP_BULK_MAX", "200"))
+TRAP_BULK_CONCURRENCY = int(os.getenv("TRAP_BULK_CONCURRENCY", "4"))
+BULK_LIMIT = 9               # same default depth as a plain /trap
+BULK_ATTACHMENT_MAX = 256 * 1024
+BULK_SHOW = 15               # ranked rows shown inline; the rest go to the CSV
+PROGRESS_EDIT_SECONDS = 2.0  # message edits are rate limited by Discord too
+ADDRESS_RE = re.compile(r"0x[0-9a-fA-F]{40}")
+WATCH_INTERVAL_SECONDS = float(os.getenv("TRAP_WATCH_INTERVAL_SECONDS", "60"))
+WATCH_MAX_PER_GUILD = int(os.getenv("TRAP_WATCH_MAX_PER_GUILD", "50"))
+WATCH_MAX_BLOCKS = 25     # further behind than this, re-check every address instead of scanning blocks
+WATCH_CONFIRMATIONS = 2   # stay behind the head so Etherscan's account index has caught up
 
 def compare_txs_by_amount_and_timestamp(normal_txs, internal_txs, radius_seconds: int = 60):
     """
@@ -112,8 +87,16 @@ class TrapCog(commands.Cog):
 
     def __init__(self, bot: commands.Bot):
         self.bot = bot
+        self.tx_cache = TxCache()
+        self.watchlist = WatchList()
+        self.watch_poll.start()
 
-    @commands.hybrid_command(name="trap")
+    def cog_unload(self):
+        self.watch_poll.cancel()
+        self.tx_cache.close()
+        self.watchlist.close()
+
+    @commands.hybrid_group(name="trap", fallback="check", invoke_without_command=True)
     async def trap_command(self, ctx: commands.Context, address: str, limit: int = 9):
         """
         Check if an Ethereum address *might* be a trap/honeypot-like wallet
@@ -122,6 +105,9 @@ class TrapCog(commands.Cog):
         Usage:
           !trap 0xYourAddressHere
           !trap 0xYourAddressHere 5   # check last 5 normal/internal txs
+          !trap deep 0xYourAddressHere  # full-history scan (see trap_deep)
+          !trap bulk 0xAAA... 0xBBB...   # many addresses (see trap_bulk)
+          !trap watch add 0xYourAddressHere  # alert this channel on new matches
         """
         if not await handle_rate_limit(ctx):
             return
@@ -142,24 +128,14 @@ class TrapCog(commands.Cog):
 
         try:
             async with ctx.typing():
-                loop = asyncio.get_running_loop()
-
-                # Run blocking HTTP calls in executor
-                normal_txs, internal_txs = await asyncio.gather(
-                    loop.run_in_executor(None, fetch_latest_normal_txs, address, limit),
-                    loop.run_in_executor(None, fetch_latest_internal_txs, address, limit),
-                )
-
-                matched_pairs = compare_txs_by_amount_and_timestamp(
-                    normal_txs, internal_txs, radius_seconds=60
-                )
+                verdict = await scheduler.run(tenant_of(ctx), self._check_address, address, limit)
 
-            total_normal = len(normal_txs)
-            total_internal = len(internal_txs)
-            total_matches = len(matched_pairs)
+            total_normal = verdict["normal"]
+            total_internal = verdict["internal"]
+            total_matches = verdict["matches"]
 
             # --- NEW: simple trap heuristic ---
-            trap_threshold = 3
+            trap_threshold = TRAP_THRESHOLD
             is_potential_trap = total_matches > trap_threshold
 
             lines = []
@@ -229,12 +205,433 @@ class TrapCog(commands.Cog):
 
             await ctx.send(msg)
 
+        except QueueFullError as e:
+            await ctx.send(f"⏳ {e} Please try again in a moment.")
+
+        except CircuitOpenError as e:
+            await ctx.send(f"⚡ Upstream {e}.")
+
+        except EtherscanError as e:
+            print(f"[TrapCog Etherscan error] {e}")
+            await ctx.send("Etherscan returned an error for this address. Please try again later.")
+
         except Exception as e:
             print(f"[TrapCog unexpected error] {type(e).__name__}: {e}")
             await ctx.send(
                 "Unexpected error while checking this address. Check bot logs for details."
             )
 
+    async def _check_address(self, address: str, limit: int) -> dict:
+        """
+        Heuristic verdict for the latest `limit` txs of `address`. Uses the
+        incremental cache: only blocks after the cached ones are fetched (or
+        nothing, if checked moments ago) and verdicts are reused until new
+        transactions arrive.
+        """
+        entry, _changed = await self.tx_cache.refresh(self.bot.http_client, address)
+
+        verdict = entry["verdicts"].get(str(limit))
+        if verdict is None:
+            normal_txs = entry["normal"][:limit]
+            internal_txs = entry["internal"][:limit]
+            matched_pairs = compare_txs_by_amount_and_timestamp(
+                normal_txs, internal_txs, radius_seconds=60
+            )
+            verdict = {
+                "normal": len(normal_txs),
+                "internal": len(internal_txs),
+                "matches": len(matched_pairs),
+            }
+            self.tx_cache.put_verdict(address, limit, verdict)
+        return verdict
+
+    @trap_command.command(name="deep")
+    async def trap_deep(self, ctx: commands.Context, address: str, max_txs: int = 10000):
+        """
+        Scan up to `max_txs` normal and internal txs of an address with the same
+        value/±60 s heuristic. Pages are streamed from Etherscan: internal txs are
+        packed into a compact sorted index, then each page of normal txs is
+        joined against it and discarded, so memory stays bounded.
+
+        Usage:
+          !trap deep 0xYourAddressHere
+          !trap deep 0xYourAddressHere 20000
+        """
+        if not await handle_rate_limit(ctx):
+            return
+
+        if not ETHERSCAN_API_KEY:
+            await ctx.send("Etherscan API key is not configured on the bot.")
+            return
+
+        if not (1 <= max_txs <= DEEP_MAX_TXS):
+            await ctx.send(f"Please provide a transaction cap between 1 and {DEEP_MAX_TXS}.")
+            return
+
+        if not address.startswith("0x") or len(address) != 42:
+            await ctx.send("Please provide a valid Ethereum address.")
+            return
+
+        print(f"-> Received /trap deep request: max_txs={max_txs}, address={address}")
+        status = await ctx.send(f"🔎 Deep scan of `{address}`: fetching internal transactions...")
+
+        try:
+            result = await scheduler.run(
+                tenant_of(ctx), self._deep_scan, address, max_txs, status
+            )
+        except QueueFullError as e:
+            await status.edit(content=f"⏳ {e} Please try again in a moment.")
+            return
+        except CircuitOpenError as e:
+            await status.edit(content=f"⚡ Upstream {e}.")
+            return
+        except EtherscanError as e:
+            print(f"[TrapCog Etherscan error] {e}")
+            await status.edit(content="Etherscan returned an error for this address. Please try again later.")
+            return
+        except Exception as e:
+            print(f"[TrapCog unexpected error] {type(e).__name__}: {e}")
+            await status.edit(content="Unexpected error while scanning this address. Check bot logs for details.")
+            return
+
+        total_normal, total_internal, pairs, matched_normals, elapsed_ms = result
+        rate = matched_normals / total_normal if total_normal else 0.0
+
+        lines = [
+            "## Trap wallet deep scan",
+            f"Address: `{address}`",
+            f"Scanned {total_normal:,} normal and {total_internal:,} internal txs.",
+            f"Matching pairs (equal value, ±60 s): **{pairs:,}** "
+            f"({matched_normals:,} normal txs, {rate:.1%}). Join took {elapsed_ms:.1f} ms.",
+            "",
+        ]
+        if pairs > TRAP_THRESHOLD:
+            lines.append("⚠️ Multiple matching transaction pairs found across this wallet's history.")
+            lines.append("⚠️ It is **potentially a trap / honeypot-like wallet** under this simple heuristic.")
+        else:
+            lines.append("No strong trap-like pattern detected by this specific heuristic.")
+        lines.append("⚠️ This is a weak heuristic and **not** a guaranteed scam detector.")
+
+        await status.edit(content="\n".join(lines))
+
+    @trap_command.command(name="bulk")
+    async def trap_bulk(self, ctx: commands.Context, attachment: discord.Attachment | None = None, *, addresses: str = ""):
+        """
+        Run the /trap heuristic over many addresses and rank them by matching
+        pairs. Addresses are taken from the message text and/or an attached
+        text/CSV file. Scans run a few at a time and every Etherscan call
+        shares one rate budget, so a long list can't trip the API limit.
+
+        Usage:
+          !trap bulk 0xAAA... 0xBBB... 0xCCC...
+          !trap bulk   (with a .txt/.csv attachment)
+        """
+        if not await handle_rate_limit(ctx):
+            return
+
+        if not ETHERSCAN_API_KEY:
+            await ctx.send("Etherscan API key is not configured on the bot.")
+            return
+
+        text = addresses
+        if attachment is not None:
+            if attachment.size > BULK_ATTACHMENT_MAX:
+                await ctx.send(f"Attachment is too large (max {BULK_ATTACHMENT_MAX // 1024} KB).")
+                return
+            text += "\n" + (await attachment.read()).decode("utf-8", errors="ignore")
+
+        # Dedupe case-insensitively, keep the order they were pasted in
+        targets = list(dict.fromkeys(a.lower() for a in ADDRESS_RE.findall(text)))
+        if not targets:
+            await ctx.send("No Ethereum addresses found. Paste them after the command or attach a text file.")
+            return
+        skipped = max(0, len(targets) - TRAP_BULK_MAX)
+        targets = targets[:TRAP_BULK_MAX]
+
+        print(f"-> Received /trap bulk request: {len(targets)} addresses")
+        status = await ctx.send(f"🔎 Bulk scan: 0/{len(targets)} addresses checked...")
+
+        tenant = tenant_of(ctx)
+        semaphore = asyncio.Semaphore(TRAP_BULK_CONCURRENCY)
+        results = {}
+        loop = asyncio.get_running_loop()
+        last_edit = loop.time()
+
+        async def scan(address: str):
+            nonlocal last_edit
+            async with semaphore:
+                try:
+                    results[address] = await scheduler.run(tenant, self._check_address, address, BULK_LIMIT)
+                except (QueueFullError, CircuitOpenError, EtherscanError) as e:
+                    results[address] = {"error": str(e)}
+                except Exception as e:
+                    print(f"[TrapCog bulk error] {address}: {type(e).__name__}: {e}")
+                    results[address] = {"error": type(e).__name__}
+
+            now = loop.time()
+            if now - last_edit >= PROGRESS_EDIT_SECONDS:
+                last_edit = now
+                try:
+                    await status.edit(content=f"🔎 Bulk scan: {len(results)}/{len(targets)} addresses checked...")
+                except discord.HTTPException:
+                    pass
+
+        await asyncio.gather(*(scan(a) for a in targets))
+
+        ranked = sorted(
+            ((a, v) for a, v in results.items() if "error" not in v),
+            key=lambda item: item[1]["matches"], reverse=True,
+        )
+        failed = [(a, v["error"]) for a, v in results.items() if "error" in v]
+        flagged = sum(1 for _, v in ranked if v["matches"] > TRAP_THRESHOLD)
+
+        lines = [
+            "## Trap wallet bulk check",
+            f"Checked {len(ranked)}/{len(targets)} addresses (latest {BULK_LIMIT} txs each); "
+            f"**{flagged}** above the trap threshold ({TRAP_THRESHOLD} pairs).",
+        ]
+        if skipped:
+            lines.append(f"{skipped} addresses over the {TRAP_BULK_MAX}-address cap were skipped.")
+        if failed:
+            lines.append(f"{len(failed)} addresses failed (see CSV).")
+        lines.append("")
+        for i, (address, verdict) in enumerate(ranked[:BULK_SHOW], start=1):
+            mark = "⚠️" if verdict["matches"] > TRAP_THRESHOLD else "•"
+            lines.append(f"{mark} {i}. `{address}`: {verdict['matches']} pairs")
+        lines.append("")
+        lines.append("⚠️ This is a weak heuristic and **not** a guaranteed scam detector.")
+
+        msg = "\n".join(lines)
+        if len(msg) > 2000:
+            msg = msg[:1900] + "\n...(truncated)..."
+
+        file = None
+        if len(ranked) > BULK_SHOW or failed:
+            buf = io.StringIO()
+            writer = csv.writer(buf)
+            writer.writerow(["rank", "address", "matched_pairs", "normal_txs", "internal_txs", "error"])
+            for i, (address, verdict) in enumerate(ranked, start=1):
+                writer.writerow([i, address, verdict["matches"], verdict["normal"], verdict["internal"], ""])
+            for address, error in failed:
+                writer.writerow(["", address, "", "", "", error])
+            file = discord.File(io.BytesIO(buf.getvalue().encode("utf-8")), filename="trap_bulk.csv")
+
+        await status.edit(content="✅ Bulk scan finished.")
+        if file:
+            await ctx.send(msg, file=file)
+        else:
+            await ctx.send(msg)
+
+    # --- Watchlist ---
+    @trap_command.group(name="watch", invoke_without_command=True)
+    @commands.guild_only()
+    async def trap_watch(self, ctx: commands.Context):
+        """Manage addresses monitored in the background: add, remove, list."""
+        await ctx.send("Usage: `/trap watch add <0x-address>`, `/trap watch remove <0x-address>`, `/trap watch list`")
+
+    @trap_watch.command(name="add")
+    @commands.guild_only()
+    async def trap_watch_add(self, ctx: commands.Context, address: str):
+        """Watch an address; this channel is alerted when its match count crosses the threshold."""
+        if not await handle_rate_limit(ctx):
+            return
+
+        if not ETHERSCAN_API_KEY:
+            await ctx.send("Etherscan API key is not configured on the bot.")
+            return
+
+        if not ADDRESS_RE.fullmatch(address):
+            await ctx.send("Please provide a valid Ethereum address.")
+            return
+
+        if len(self.watchlist.for_guild(ctx.guild.id)) >= WATCH_MAX_PER_GUILD:
+            await ctx.send(f"This server already watches {WATCH_MAX_PER_GUILD} addresses. Remove one first.")
+            return
+
+        address = address.lower()
+        try:
+            async with ctx.typing():
+                # Baseline from the cached latest txs; the monitor only adds pairs from newer ones
+                entry, _changed = await scheduler.run(
+                    tenant_of(ctx), self.tx_cache.refresh, self.bot.http_client, address
+                )
+        except QueueFullError as e:
+            await ctx.send(f"⏳ {e} Please try again in a moment.")
+            return
+        except CircuitOpenError as e:
+            await ctx.send(f"⚡ Upstream {e}.")
+            return
+        except EtherscanError as e:
+            print(f"[TrapCog Etherscan error] {e}")
+            await ctx.send("Etherscan returned an error for this address. Please try again later.")
+            return
+
+        matches = len(compare_txs_by_amount_and_timestamp(entry["normal"], entry["internal"], radius_seconds=60))
+        existing = self.watchlist.get(address)
+        if existing is not None:
+            matches = existing["matches"]
+        above = matches > TRAP_THRESHOLD
+
+        if not self.watchlist.add(address, ctx.guild.id, ctx.channel.id, matches, alerted=above):
+            await ctx.send(f"`{address}` is already on this server's watchlist.")
+            return
+
+        note = " ⚠️ Already above the trap threshold." if above else ""
+        await ctx.send(f"👀 Watching `{address}` ({matches} matching pairs so far). Alerts go to this channel.{note}")
+
+    @trap_watch.command(name="remove")
+    @commands.guild_only()
+    async def trap_watch_remove(self, ctx: commands.Context, address: str):
+        """Stop watching an address on this server."""
+        if self.watchlist.remove(address, ctx.guild.id):
+            await ctx.send(f"Stopped watching `{address.lower()}`.")
+        else:
+            await ctx.send(f"`{address}` is not on this server's watchlist.")
+
+    @trap_watch.command(name="list")
+    @commands.guild_only()
+    async def trap_watch_list(self, ctx: commands.Context):
+        """Show this server's watched addresses and their running match counts."""
+        watched = self.watchlist.for_guild(ctx.guild.id)
+        if not watched:
+            await ctx.send("No addresses are being watched on this server.")
+            return
+
+        lines = [f"## Trap watchlist ({len(watched)}/{WATCH_MAX_PER_GUILD})"]
+        for address, entry in sorted(watched, key=lambda item: item[1]["matches"], reverse=True):
+            mark = "⚠️" if entry["matches"] > TRAP_THRESHOLD else "•"
+            lines.append(f"{mark} `{address}`: {entry['matches']} pairs → <#{entry['channels'][str(ctx.guild.id)]}>")
+
+        msg = "\n".join(lines)
+        if len(msg) > 2000:
+            msg = msg[:1900] + "\n...(truncated)..."
+        await ctx.send(msg)
+
+    @tasks.loop(seconds=WATCH_INTERVAL_SECONDS)
+    async def watch_poll(self):
+        try:
+            await self._poll_watchlist()
+        except (CircuitOpenError, EtherscanError) as e:
+            # The cursor only advances after a full pass, so the next cycle retries
+            print(f"[TrapCog watch] poll skipped: {e}")
+        except Exception as e:
+            print(f"[TrapCog watch] poll failed: {type(e).__name__}: {e}")
+
+    @watch_poll.before_loop
+    async def before_watch_poll(self):
+        await self.bot.wait_until_ready()
+
+    async def _poll_watchlist(self):
+        """
+        One cycle: a single block-number call, then the blocks mined since the
+        last cycle are scanned for watched from/to addresses. Only those
+        addresses are refreshed, so the cost tracks activity rather than the
+        watchlist size. Internal-only activity is picked up with the next
+        normal tx or catch-up pass.
+        """
+        watched = self.watchlist.addresses()
+        if not watched or not ETHERSCAN_API_KEY:
+            return
+
+        http = self.bot.http_client
+        head = await fetch_block_number(http) - WATCH_CONFIRMATIONS
+        last = self.watchlist.last_block()
+        if last is not None and head <= last:
+            return
+
+        if last is None or head - last > WATCH_MAX_BLOCKS:
+            # First run or a long outage: fall back to re-checking everyone once
+            dirty = watched
+        else:
+            blocks = await asyncio.gather(*(fetch_block_addresses(http, n) for n in range(last + 1, head + 1)))
+            dirty = set().union(*blocks) & watched
+
+        for address in dirty:
+            await self._update_watched(address)
+        self.watchlist.set_last_block(head)
+
+    async def _update_watched(self, address: str):
+        old = self.tx_cache.get(address)
+
+        entry, changed = await self.tx_cache.refresh(self.bot.http_client, address, fresh_seconds=0)
+        if not changed:
+            return
+
+        watch = self.watchlist.get(address)
+        if watch is None:  # removed while we were fetching
+            return
+
+        if old is None:
+            # Cache entry was missing (evicted or reset): the fetch is a full baseline that already
+            # includes this block, so re-baseline instead of adding its pairs a second time
+            baseline = len(compare_txs_by_amount_and_timestamp(entry["normal"], entry["internal"], radius_seconds=60))
+            if baseline <= watch["matches"]:
+                return
+            watch["matches"] = baseline
+        else:
+            # Only pairs involving a new tx: new normals vs all internals, old normals vs new internals
+            new_normal = [tx for tx in entry["normal"] if int(tx.get("blockNumber") or 0) > old["normal_block"]]
+            old_normal = [tx for tx in entry["normal"] if int(tx.get("blockNumber") or 0) <= old["normal_block"]]
+            new_internal = [tx for tx in entry["internal"] if int(tx.get("blockNumber") or 0) > old["internal_block"]]
+            new_pairs = (
+                len(compare_txs_by_amount_and_timestamp(new_normal, entry["internal"], radius_seconds=60))
+                + len(compare_txs_by_amount_and_timestamp(old_normal, new_internal, radius_seconds=60))
+            )
+            if not new_pairs:
+                return
+            watch["matches"] += new_pairs
+
+        crossed = watch["matches"] > TRAP_THRESHOLD and not watch["alerted"]
+        if crossed:
+            watch["alerted"] = True
+        self.watchlist.put(address, watch)
+
+        if crossed:
+            await self._send_watch_alert(address, watch)
+
+    async def _send_watch_alert(self, address: str, watch: dict):
+        msg = (
+            "## ⚠️ Trap watchlist alert\n"
+            f"`{address}` now has **{watch['matches']}** matching normal/internal pairs "
+            f"(equal value, ±60 s), above the threshold of {TRAP_THRESHOLD}.\n"
+            "It is **potentially a trap / honeypot-like wallet** under this simple heuristic."
+        )
+        for channel_id in watch["channels"].values():
+            channel = self.bot.get_channel(channel_id)
+            if channel is None:
+                continue
+            try:
+                await channel.send(msg)
+            except discord.HTTPException as e:
+                print(f"[TrapCog watch] alert to {channel_id} failed: {e}")
+
+    async def _deep_scan(self, address: str, max_txs: int, status):
+        http = self.bot.http_client
+        index = InternalIndex()
+        total_internal = 0
+        async for page in iter_tx_pages(http, "txlistinternal", address, DEEP_PAGE_SIZE, max_txs):
+            index.add(page)
+            total_internal += len(page)
+        index.freeze()
+
+        await status.edit(content=(
+            f"🔎 Deep scan of `{address}`: indexed {total_internal:,} internal txs, "
+            "streaming normal transactions..."
+        ))
+
+        loop = asyncio.get_running_loop()
+        total_normal = pairs = matched_normals = 0
+        join_seconds = 0.0
+        async for page in iter_tx_pages(http, "txlist", address, DEEP_PAGE_SIZE, max_txs):
+            start = loop.time()
+            page_pairs, page_matched = index.count_matches(page, radius_seconds=60)
+            join_seconds += loop.time() - start
+            total_normal += len(page)
+            pairs += page_pairs
+            matched_normals += page_matched
+
+        return total_normal, total_internal, pairs, matched_normals, join_seconds * 1000
+
 
 async def setup(bot: commands.Bot):
     await bot.add_cog(TrapCog(bot))
@@ -0,0 +1,245 @@
+import os
+import time
+import random
+import asyncio
+
+from discord.ext import commands, tasks
+
+from utils.rate_limit import handle_rate_limit
+from utils.uptime.store import UptimeStore
+from utils.probe import ProbeError, parse_target, probe, resolve
+
+# --- Configuration ---
+UPTIME_DEFAULT_INTERVAL = int(os.getenv("UPTIME_DEFAULT_INTERVAL", "300"))
+UPTIME_MIN_INTERVAL = int(os.getenv("UPTIME_MIN_INTERVAL", "60"))
+UPTIME_MAX_PER_GUILD = int(os.getenv("UPTIME_MAX_PER_GUILD", "20"))
+UPTIME_CONCURRENCY = int(os.getenv("UPTIME_CONCURRENCY", "10"))
+UPTIME_JITTER = 0.1  # each probe lands within ±10% of its interval
+TICK_SECONDS = 5
+WINDOWS = (("1h", 3600), ("24h", 86400), ("7d", 7 * 86400))
+
+
+def _fmt_ms(value: float | None) -> str:
+    if value is None:
+        return "–"
+    if value == float("inf"):
+        return ">2000"
+    return f"{value:.0f}"
+
+
+class Uptime(commands.Cog):
+    """
+    Periodic probes of registered endpoints using the /ping connect and proxy
+    checks. Each endpoint gets its own randomly phased, jittered schedule so
+    probes spread out instead of firing together every interval.
+    """
+
+    def __init__(self, bot: commands.Bot):
+        self.bot = bot
+        self.store = UptimeStore()
+        self._next_due: dict[str, float] = {}
+        self._running: set[str] = set()
+        self._tasks: set[asyncio.Task] = set()
+        self._semaphore = asyncio.Semaphore(UPTIME_CONCURRENCY)
+        self.probe_tick.start()
+        self.daily_prune.start()
+
+    def cog_unload(self):
+        self.probe_tick.cancel()
+        self.daily_prune.cancel()
+        for task in self._tasks:
+            task.cancel()
+        self.store.close()
+
+    # --- Scheduling ---
+    def _schedule(self, endpoint: str, interval: int, first: bool = False) -> None:
+        now = time.time()
+        if first:
+            # Random phase spreads endpoints registered (or reloaded) together
+            self._next_due[endpoint] = now + random.uniform(0, interval)
+        else:
+            self._next_due[endpoint] = now + interval * random.uniform(1 - UPTIME_JITTER, 1 + UPTIME_JITTER)
+
+    @tasks.loop(seconds=TICK_SECONDS)
+    async def probe_tick(self):
+        now = time.time()
+        registered = self.store.endpoints()
+        for endpoint in list(self._next_due):
+            if endpoint not in registered:
+                del self._next_due[endpoint]
+
+        for endpoint, entry in registered.items():
+            due = self._next_due.get(endpoint)
+            if due is None:
+                self._schedule(endpoint, entry["interval"], first=True)
+                continue
+            if due > now or endpoint in self._running:
+                continue
+            self._schedule(endpoint, entry["interval"])
+            self._running.add(endpoint)
+            task = asyncio.create_task(self._probe(endpoint))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+    @probe_tick.before_loop
+    async def before_probe_tick(self):
+        await self.bot.wait_until_ready()
+
+    async def _probe(self, endpoint: str) -> None:
+        host, _, port = endpoint.rpartition(":")
+        try:
+            async with self._semaphore:
+                try:
+                    result = await probe(host, int(port))
+                except ProbeError as e:
+                    print(f"[Uptime] {endpoint}: {e}")
+                    result = None
+            best = result and result["best"]
+            latency_ms = result["summaries"][best]["min"] if best else None
+            self.store.record(endpoint, time.time(), latency_ms)
+        except Exception as e:
+            print(f"[Uptime] probe of {endpoint} failed: {type(e).__name__}: {e}")
+        finally:
+            self._running.discard(endpoint)
+
+    @tasks.loop(hours=24)
+    async def daily_prune(self):
+        removed = self.store.prune()
+        if removed:
+            print(f"[Uptime] pruned {removed} expired buckets")
+
+    @daily_prune.before_loop
+    async def before_daily_prune(self):
+        await self.bot.wait_until_ready()
+
+    # --- Commands ---
+    @commands.hybrid_group(name="uptime", fallback="report", invoke_without_command=True)
+    @commands.guild_only()
+    async def uptime(self, ctx: commands.Context, target: str):
+        """
+        Availability and connect-latency percentiles for a monitored endpoint
+        over the last hour, day and week.
+
+        Usage:
+          /uptime example.com
+          /uptime add example.com [interval_seconds]
+        """
+        if not await handle_rate_limit(ctx):
+            return
+
+        parsed = parse_target(target)
+        if parsed is None:
+            await ctx.send("Could not parse a valid hostname from your input.")
+            return
+        endpoint = f"{parsed[0]}:{parsed[1]}"
+
+        entry = self.store.get_endpoint(endpoint)
+        if entry is None or str(ctx.guild.id) not in entry["guilds"]:
+            # Other servers' endpoints are not visible here
+            await ctx.send(f"`{endpoint}` is not monitored on this server. Add it with `/uptime add {target}`.")
+            return
+
+        lines = [
+            f"## Uptime for `{endpoint}`",
+            f"Probed every ~{entry['interval']} s (TCP connect).",
+            "```",
+            f"{'window':<7}{'avail':>9}{'samples':>9}{'p50':>7}{'p95':>7}{'p99':>7}",
+        ]
+        for label, seconds in WINDOWS:
+            s = self.store.summary(endpoint, seconds)
+            avail = f"{s['availability']:.2%}" if s["availability"] is not None else "–"
+            lines.append(
+                f"{label:<7}{avail:>9}{s['samples']:>9}"
+                f"{_fmt_ms(s['p50_ms']):>7}{_fmt_ms(s['p95_ms']):>7}{_fmt_ms(s['p99_ms']):>7}"
+            )
+        lines.append("```")
+        lines.append("Latencies in ms, as histogram bucket upper bounds.")
+        await ctx.send("\n".join(lines))
+
+    @uptime.command(name="add")
+    @commands.guild_only()
+    async def uptime_add(self, ctx: commands.Context, target: str, interval: int = UPTIME_DEFAULT_INTERVAL):
+        """Start monitoring an endpoint every `interval` seconds."""
+        if not await handle_rate_limit(ctx):
+            return
+
+        if interval < UPTIME_MIN_INTERVAL:
+            await ctx.send(f"Please use an interval of at least {UPTIME_MIN_INTERVAL} seconds.")
+            return
+
+        parsed = parse_target(target)
+        if parsed is None:
+            await ctx.send("Could not parse a valid hostname from your input.")
+            return
+        host, port, _tls = parsed
+        endpoint = f"{host}:{port}"
+        gid = str(ctx.guild.id)
+
+        mine = [e for e in self.store.endpoints().values() if gid in e["guilds"]]
+        if len(mine) >= UPTIME_MAX_PER_GUILD:
+            await ctx.send(f"This server already monitors {UPTIME_MAX_PER_GUILD} endpoints. Remove one first.")
+            return
+
+        try:
+            # Same resolution and private-address checks as /ping before anything is scheduled
+            await resolve(host, port)
+        except ProbeError as e:
+            await ctx.send(str(e))
+            return
+
+        entry = self.store.get_endpoint(endpoint) or {"guilds": [], "interval": interval, "added_at": int(time.time())}
+        if gid in entry["guilds"]:
+            await ctx.send(f"`{endpoint}` is already monitored on this server.")
+            return
+        entry["guilds"].append(gid)
+        # Shared endpoints are probed at the tightest interval anyone asked for
+        entry["interval"] = min(entry["interval"], interval)
+        self.store.put_endpoint(endpoint, entry)
+        self._next_due.pop(endpoint, None)
+
+        await ctx.send(f"📈 Monitoring `{endpoint}` every ~{entry['interval']} s. Check it with `/uptime {endpoint}`.")
+
+    @uptime.command(name="remove")
+    @commands.guild_only()
+    async def uptime_remove(self, ctx: commands.Context, target: str):
+        """Stop monitoring an endpoint on this server."""
+        parsed = parse_target(target)
+        endpoint = f"{parsed[0]}:{parsed[1]}" if parsed else target
+        entry = self.store.get_endpoint(endpoint)
+        gid = str(ctx.guild.id)
+        if entry is None or gid not in entry["guilds"]:
+            await ctx.send(f"`{endpoint}` is not monitored on this server.")
+            return
+
+        entry["guilds"].remove(gid)
+        if entry["guilds"]:
+            self.store.put_endpoint(endpoint, entry)
+        else:
+            # Samples age out through normal retention
+            self.store.delete_endpoint(endpoint)
+        await ctx.send(f"Stopped monitoring `{endpoint}`.")
+
+    @uptime.command(name="list")
+    @commands.guild_only()
+    async def uptime_list(self, ctx: commands.Context):
+        """Endpoints monitored on this server with their 24h availability."""
+        gid = str(ctx.guild.id)
+        mine = {ep: e for ep, e in self.store.endpoints().items() if gid in e["guilds"]}
+        if not mine:
+            await ctx.send("No endpoints are monitored on this server.")
+            return
+
+        lines = [f"## Monitored endpoints ({len(mine)}/{UPTIME_MAX_PER_GUILD})"]
+        for endpoint, entry in sorted(mine.items()):
+            s = self.store.summary(endpoint, 86400)
+            avail = f"{s['availability']:.2%}" if s["availability"] is not None else "no data yet"
+            lines.append(f"• `{endpoint}` every ~{entry['interval']} s: {avail} (24h)")
+
+        msg = "\n".join(lines)
+        if len(msg) > 2000:
+            msg = msg[:1900] + "\n...(truncated)..."
+        await ctx.send(msg)
+
+
+async def setup(bot: commands.Bot):
+    await bot.add_cog(Uptime(bot))
@@ -4,6 +4,7 @@ from discord.ext import commands
 from dotenv import load_dotenv
 import asyncio
 from utils.terminal_ascii import outsourced1
+from utils.http_client import HttpClient
 
 # --- Configuration ---
 load_dotenv()
@@ -17,12 +18,17 @@ class ShunyaBot(commands.Bot):
         intents.message_content = True
         intents.members = True
         super().__init__(command_prefix='/', intents=intents, help_command=None)
+        # Shared pooled HTTP client for all cogs (`self.http` is discord.py's own client)
+        self.http_client = HttpClient()
 
     async def setup_hook(self):
         """
         This is called ONCE when the bot starts, BEFORE on_ready.
         Load extensions (Cogs) here to ensure they are registered before sync.
         """
+        # Open the shared HTTP session first; cogs grab it in their __init__
+        await self.http_client.start()
+
         print("Loading cogs...")
         for root, dirs, files in os.walk('./cogs'):
             if '__pycache__' in dirs:
@@ -43,6 +49,10 @@ class ShunyaBot(commands.Bot):
         # self.tree.copy_global_to(guild=TEST_GUILD)
         # await self.tree.sync(guild=TEST_GUILD)
 
+    async def close(self):
+        await super().close()
+        await self.http_client.close()
+
 # --- Instantiate Bot ---
 bot = ShunyaBot()
 
@@ -59,7 +69,7 @@ async def on_ready():
 
     print(outsourced1)
     print(f'Shunya logged in as {bot.user}')
-    print('Ready with /trap, /shodan, /asc, /tarot, /weather, /ping, /dns, and /help commands.')
+    print('Ready with /trap, /shodan, /asc, /tarot, /weather, /ping, /uptime, /dns, /stats, and /help commands.')
 
 
 # --- Help Command ---
@@ -79,8 +89,11 @@ async def help_command(ctx):
         name="/shodan",
         value=(
             "Searches Shodan for internet-facing devices.\n"
-            "• Usage: `/shodan <query>`\n"
-            "• Returns up to 5 summary results from the Shodan API"
+            "• Usage: `/shodan <query>` (slash: `/shodan search`)\n"
+            "• Pages through results one host at a time (◀ / ▶ buttons)\n"
+            "• `/shodan summary <query>`: top ports/countries/orgs/products, no query credits\n"
+            "• `/shodan export [xlsx|csv] <query>`: full results as a file attachment\n"
+            "• `/shodan host <ip> [ip...]`: ports, vulns and org for specific IPs"
         ),
         inline=False
     )
@@ -118,10 +131,21 @@ async def help_command(ctx):
     )
 
     embed.add_field(
-        name="/ping `<url>`",
+        name="/ping `<url>` `[count]`",
         value=(
             "Checks whether a site is online and responding.\n"
-            "• Useful for quick uptime checks on your services"
+            "• Useful for quick uptime checks on your services\n"
+            "• `count` > 1 reports min/avg/p95/stddev/loss and races IPv4 vs IPv6\n"
+            "• `/ping batch <hosts...>` or a .txt attachment: many hosts at once"
+        ),
+        inline=False
+    )
+
+    embed.add_field(
+        name="/uptime `<url>`",
+        value=(
+            "Availability and latency percentiles over 1h / 24h / 7d for a monitored endpoint.\n"
+            "• `/uptime add <url> [interval]`, `/uptime remove <url>`, `/uptime list`"
         ),
         inline=False
     )
@@ -139,12 +163,24 @@ async def help_command(ctx):
         name="/trap `<eth_address>`",
         value=(
             "Heuristically checks if an Ethereum wallet might behave like a trap/honeypot.\n"
-            "• Usage: `/trap <0x-address> [limit]`\n"
+            "• Usage: `/trap <0x-address> [limit]` (slash: `/trap check`)\n"
+            "• `/trap deep <0x-address> [max_txs]`: scans the full history (10k+ txs)\n"
+            "• `/trap bulk <addresses...>` or a .txt/.csv attachment: ranks many wallets\n"
+            "• `/trap watch add|remove|list`: background monitoring with channel alerts\n"
             "• This is a weak heuristic only and **not** a guaranteed scam detector"
         ),
         inline=False
     )
 
+    embed.add_field(
+        name="/stats `[section]`",
+        value=(
+            "Shows internal metrics such as per-server queue depth for expensive commands.\n"
+            "• Expensive commands are queued per server and served fairly"
+        ),
+        inline=False
+    )
+
     embed.add_field(
         name="/help",
         value="Shows this help message.",
@@ -0,0 +1,60 @@
+import os
+import time
+import unittest
+
+os.environ.setdefault("GEMINI_API_KEY", "test")
+
+from google.genai import errors, types
+
+from utils import ai
+
+
+def _chunk(text: str) -> types.GenerateContentResponse:
+    return types.GenerateContentResponse(
+        candidates=[types.Candidate(content=types.Content(parts=[types.Part(text=text)]))]
+    )
+
+
+class StreamingPrefixFallbackTest(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self.calls = []
+        self.deleted = {"cachedContents/gone"}
+        self.saved = (ai.client.aio.models.generate_content_stream, ai.client.aio.caches.create)
+
+        async def create(model, config):
+            return types.CachedContent(name="cachedContents/fresh")
+
+        async def generate_content_stream(model, contents, config):
+            self.calls.append(config.cached_content)
+
+            # Like google-genai, the request only happens once the stream is iterated
+            async def stream():
+                if config.cached_content in self.deleted:
+                    raise errors.ClientError(404, {"error": {"code": 404, "message": "not found", "status": "NOT_FOUND"}})
+                yield _chunk("hello")
+
+            return stream()
+
+        ai.client.aio.caches.create = create
+        ai.client.aio.models.generate_content_stream = generate_content_stream
+
+    async def asyncTearDown(self):
+        ai.client.aio.models.generate_content_stream, ai.client.aio.caches.create = self.saved
+
+    async def test_deleted_handle_falls_back_inline_and_is_recreated(self):
+        prefix = ai.PromptPrefix("system prompt", display_name="test")
+        # A handle we still believe is live, but which Gemini has already deleted
+        prefix._handles[False] = ("cachedContents/gone", time.monotonic() + 3600)
+
+        text = "".join([c async for c in ai.stream_response("hi", enable_search=False, system=prefix)])
+        self.assertEqual(text, "hello")
+        self.assertEqual(self.calls, ["cachedContents/gone", None])
+        self.assertNotIn(False, prefix._handles)
+
+        text = "".join([c async for c in ai.stream_response("hi", enable_search=False, system=prefix)])
+        self.assertEqual(text, "hello")
+        self.assertEqual(self.calls[-1], "cachedContents/fresh")
+
+
+if __name__ == "__main__":
+    unittest.main()
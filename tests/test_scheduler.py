@@ -0,0 +1,34 @@
+import asyncio
+import unittest
+
+from utils.scheduler import FairScheduler
+
+
+class CancelledWaiterTest(unittest.IsolatedAsyncioTestCase):
+    async def test_cancelled_waiter_does_not_leak_a_slot(self):
+        sched = FairScheduler(max_concurrency=1, per_guild_inflight=1, max_queue_per_guild=10)
+        release = asyncio.Event()
+
+        async def hold():
+            await release.wait()
+            return "held"
+
+        holder = asyncio.create_task(sched.run("g", hold))
+        await asyncio.sleep(0)
+        waiter = asyncio.create_task(sched.run("g", asyncio.sleep, 0))
+        await asyncio.sleep(0)
+
+        # The holder wakes (and releases) before the cancelled waiter gets to clean up
+        release.set()
+        waiter.cancel()
+        self.assertEqual(await holder, "held")
+        with self.assertRaises(asyncio.CancelledError):
+            await waiter
+
+        self.assertEqual(sched._running, 0)
+        self.assertEqual(sched._inflight.get("g", 0), 0)
+        self.assertEqual(await asyncio.wait_for(sched.run("g", asyncio.sleep, 0, "ok"), 1), "ok")
+
+
+if __name__ == "__main__":
+    unittest.main()
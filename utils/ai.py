@@ -1,32 +1,281 @@
 
 import os
+import time
+import asyncio
 from google import genai
 from dotenv import load_dotenv
-from google.genai import types
+from google.genai import types, errors
+
+from utils.breaker import get_breaker
+from utils.latency import latency
+from utils.ai_usage import usage, BudgetMode, BudgetExceededError
 
 load_dotenv()
 
 GEMINI_API_KEY = os.getenv('GEMINI_API_KEY')
 GEMINI_MODEL = "gemini-2.5-flash-lite"
 
+GEMINI_PREFIX_TTL_SECONDS = int(os.getenv("GEMINI_PREFIX_TTL_SECONDS", "3600"))
+PREFIX_REFRESH_MARGIN = 60   # extend a cached prefix this long before it would expire
+PREFIX_RETRY_SECONDS = 300   # after a transient failure to create one, send the prefix inline meanwhile
+
 # Single shared client; uses GEMINI_API_KEY/GOOGLE_API_KEY env automatically
 client = genai.Client(api_key=GEMINI_API_KEY)
 
-# Async helper for Discord commands
-async def generate_response(prompt: str, enable_search: bool = True) -> str:
-    tools = []
+
+def _is_gemini_failure(e: Exception) -> bool:
+    # Bad prompts/4xx are our problem; only rate limits, 5xx and timeouts trip the breaker
+    if isinstance(e, errors.APIError):
+        return e.code == 429 or e.code >= 500
+    return True
+
+
+def _is_grounded(resp) -> bool:
+    """Whether Gemini actually ran a search for this response (grounding is billed per prompt)."""
+    for candidate in resp.candidates or []:
+        meta = candidate.grounding_metadata
+        if meta is not None and meta.web_search_queries:
+            return True
+    return False
+
+
+def _apply_budget(tenant: str | None, enable_search: bool) -> bool:
+    """Raise once the guild's budget is gone; otherwise return whether grounding is still allowed."""
+    mode = usage.mode(tenant)
+    if mode >= BudgetMode.REFUSE:
+        usage.note_degraded("refused")
+        raise BudgetExceededError("this server has used up today's AI budget")
+    if enable_search and mode >= BudgetMode.NO_SEARCH:
+        usage.note_degraded("no_search")
+        return False
+    return enable_search
+
+
+def _tools(enable_search: bool) -> list:
     if enable_search:
         # Enable Google Search grounding
-        tools = [types.Tool(google_search=types.GoogleSearch())]
-
-    # Use the async client
-    aclient = client.aio
-    resp = await aclient.models.generate_content(
-        model=GEMINI_MODEL,
-        contents=prompt,
-        config=types.GenerateContentConfig(
-            tools=tools,
-        ),
+        return [types.Tool(google_search=types.GoogleSearch())]
+    return []
+
+
+class PromptPrefix:
+    """
+    A fixed system instruction shared by every request from one call site.
+
+    It is uploaded once per process as a Gemini cached-content handle (one per
+    grounding setting, since tools are fixed when the cache is created), and
+    the handle's TTL is extended shortly before it runs out, so requests carry
+    only their variable part. If Gemini will not cache the instruction, e.g.
+    because it is under the model's minimum cacheable size, it is sent inline
+    as system_instruction instead.
+    """
+
+    def __init__(self, instruction: str, display_name: str = "prefix", ttl: int = GEMINI_PREFIX_TTL_SECONDS):
+        self.instruction = instruction
+        self.display_name = display_name
+        self.ttl = ttl
+        self._handles: dict[bool, tuple[str, float]] = {}  # enable_search -> (cache name, expires_at)
+        self._lock = asyncio.Lock()
+        self._cacheable = bool(instruction)
+        self._retry_at = 0.0
+
+    def inline_config(self, enable_search: bool) -> types.GenerateContentConfig:
+        return types.GenerateContentConfig(tools=_tools(enable_search), system_instruction=self.instruction or None)
+
+    def invalidate(self, enable_search: bool) -> None:
+        self._handles.pop(enable_search, None)
+
+    def _fresh(self, enable_search: bool) -> str | None:
+        entry = self._handles.get(enable_search)
+        if entry is not None and entry[1] - PREFIX_REFRESH_MARGIN > time.monotonic():
+            return entry[0]
+        return None
+
+    async def handle(self, enable_search: bool, timeout: float) -> str | None:
+        """Name of a live cached-content handle, or None to send the instruction inline."""
+        name = self._fresh(enable_search)
+        if name is not None or not self._cacheable or time.monotonic() < self._retry_at:
+            return name
+        async with self._lock:
+            name = self._fresh(enable_search)
+            if name is not None:
+                return name
+            try:
+                name = await asyncio.wait_for(self._renew(enable_search), timeout=timeout)
+            except errors.ClientError as e:
+                if e.code == 429:
+                    self._retry_at = time.monotonic() + PREFIX_RETRY_SECONDS
+                else:
+                    # Too small to cache or unsupported by the model; that won't change until restart
+                    print(f"[Gemini] not caching prompt prefix {self.display_name!r}: {e}")
+                    self._cacheable = False
+                return None
+            except Exception as e:
+                print(f"[Gemini] prompt prefix {self.display_name!r} unavailable: {type(e).__name__}: {e}")
+                self._retry_at = time.monotonic() + PREFIX_RETRY_SECONDS
+                return None
+            self._handles[enable_search] = (name, time.monotonic() + self.ttl)
+            return name
+
+    async def _renew(self, enable_search: bool) -> str:
+        entry = self._handles.get(enable_search)
+        if entry is not None and entry[1] > time.monotonic():
+            try:
+                # Still alive: pushing its expiry out is cheaper than re-uploading
+                cache = await client.aio.caches.update(
+                    name=entry[0], config=types.UpdateCachedContentConfig(ttl=f"{self.ttl}s")
+                )
+                return cache.name
+            except errors.ClientError:
+                pass
+        cache = await client.aio.caches.create(
+            model=GEMINI_MODEL,
+            config=types.CreateCachedContentConfig(
+                display_name=f"{self.display_name}-{'search' if enable_search else 'plain'}",
+                system_instruction=self.instruction,
+                tools=_tools(enable_search),
+                ttl=f"{self.ttl}s",
+            ),
+        )
+        return cache.name
+
+    async def close(self) -> None:
+        """Delete the uploaded handles now instead of paying storage until their TTL runs out."""
+        handles, self._handles = self._handles, {}
+        for name, _expires in handles.values():
+            try:
+                await client.aio.caches.delete(name=name)
+            except Exception as e:
+                print(f"[Gemini] could not delete cached prefix {name}: {type(e).__name__}: {e}")
+
+
+async def _open(send, enable_search: bool, system: PromptPrefix | None, timeout: float):
+    """
+    Run `send(config)` through `system`'s cached handle when it has one, and
+    again with the instruction inline if Gemini rejects the handle. `send`
+    must include whatever actually issues the request (for streams, the
+    first chunk), or a rejected handle would only surface afterwards.
+    """
+    if system is None:
+        return await send(types.GenerateContentConfig(tools=_tools(enable_search)))
+
+    name = await system.handle(enable_search, timeout)
+    if name is not None:
+        try:
+            return await send(types.GenerateContentConfig(cached_content=name))
+        except errors.ClientError as e:
+            if e.code not in (400, 403, 404):
+                raise
+            # Handle expired or was deleted behind our back; answer inline and re-create next time
+            system.invalidate(enable_search)
+    return await send(system.inline_config(enable_search))
+
+
+# Async helper for Discord commands
+async def generate_response(prompt: str, enable_search: bool = True, *, site: str = "other",
+                            tenant: str | None = None, system: PromptPrefix | None = None) -> str:
+    """
+    Raises CircuitOpenError without calling Gemini while its circuit is open,
+    and BudgetExceededError once `tenant` has spent its daily budget. Usage is
+    accounted under `site` and `tenant`. With `system`, `prompt` is only the
+    variable part of the request.
+    """
+    enable_search = _apply_budget(tenant, enable_search)
+    return await get_breaker("gemini").call(
+        _generate_response, prompt, enable_search, site, tenant, system, is_failure=_is_gemini_failure
     )
+
+
+async def _generate_response(prompt: str, enable_search: bool, site: str, tenant: str | None,
+                             system: PromptPrefix | None) -> str:
+    # Use the async client; the timeout adapts to Gemini's observed p99
+    timeout = latency.timeout("gemini")
+    loop = asyncio.get_running_loop()
+
+    async def send(config):
+        return await asyncio.wait_for(
+            client.aio.models.generate_content(model=GEMINI_MODEL, contents=prompt, config=config),
+            timeout=timeout,
+        )
+
+    start = loop.time()
+    try:
+        resp = await _open(send, enable_search, system, timeout)
+    except asyncio.TimeoutError:
+        latency.observe_timeout("gemini", timeout)
+        raise
+    elapsed = loop.time() - start
+    latency.observe("gemini", elapsed)
+    usage.record(site, tenant, resp.usage_metadata, _is_grounded(resp), elapsed)
     # print(resp.text)
     return resp.text or "No response."
+
+
+async def stream_response(prompt: str, enable_search: bool = True, *, site: str = "other",
+                          tenant: str | None = None, system: PromptPrefix | None = None):
+    """
+    Streaming counterpart of generate_response: yields text chunks as Gemini
+    produces them. Same breaker, budget and adaptive timeout, the timeout
+    applied to the first chunk and to each gap between chunks.
+    """
+    enable_search = _apply_budget(tenant, enable_search)
+    breaker = get_breaker("gemini")
+    breaker.allow()
+    verdict = False
+    try:
+        async for chunk in _stream_response(prompt, enable_search, site, tenant, system):
+            yield chunk
+    except Exception as e:
+        verdict = True
+        if _is_gemini_failure(e):
+            breaker.record_failure()
+        else:
+            breaker.record_success()
+        raise
+    else:
+        verdict = True
+        breaker.record_success()
+    finally:
+        if not verdict:
+            # Consumer stopped early or was cancelled: no verdict on Gemini's health
+            breaker.release()
+
+
+async def _stream_response(prompt: str, enable_search: bool, site: str, tenant: str | None,
+                           system: PromptPrefix | None):
+    timeout = latency.timeout("gemini")
+    loop = asyncio.get_running_loop()
+
+    async def send(config):
+        stream = await asyncio.wait_for(
+            client.aio.models.generate_content_stream(model=GEMINI_MODEL, contents=prompt, config=config),
+            timeout=timeout,
+        )
+        # The stream is lazy: the request (and any error about the cached handle) happens on the first chunk
+        chunks = stream.__aiter__()
+        try:
+            first = await asyncio.wait_for(chunks.__anext__(), timeout=timeout)
+        except StopAsyncIteration:
+            first = None
+        return first, chunks
+
+    start = loop.time()
+    try:
+        chunk, chunks = await _open(send, enable_search, system, timeout)
+        usage_metadata, grounded = None, False
+        while chunk is not None:
+            # Usage arrives with the last chunk(s); grounding metadata with whichever carries it
+            usage_metadata = chunk.usage_metadata or usage_metadata
+            grounded = grounded or _is_grounded(chunk)
+            if chunk.text:
+                yield chunk.text
+            try:
+                chunk = await asyncio.wait_for(chunks.__anext__(), timeout=timeout)
+            except StopAsyncIteration:
+                chunk = None
+    except asyncio.TimeoutError:
+        latency.observe_timeout("gemini", timeout)
+        raise
+    elapsed = loop.time() - start
+    latency.observe("gemini", elapsed)
+    usage.record(site, tenant, usage_metadata, grounded, elapsed)
@@ -0,0 +1,172 @@
+import os
+from enum import IntEnum
+from datetime import datetime, timezone
+from collections import defaultdict
+from dotenv import load_dotenv
+
+from utils import metrics
+
+# --- Configuration ---
+load_dotenv()
+# List prices in USD; override when the model or pricing changes
+GEMINI_PRICE_INPUT_PER_M = float(os.getenv("GEMINI_PRICE_INPUT_PER_M", "0.10"))
+GEMINI_PRICE_OUTPUT_PER_M = float(os.getenv("GEMINI_PRICE_OUTPUT_PER_M", "0.40"))
+GEMINI_CACHED_INPUT_FACTOR = float(os.getenv("GEMINI_CACHED_INPUT_FACTOR", "0.25"))  # cached prefix tokens bill at this share
+GEMINI_PRICE_GROUNDED_PER_K = float(os.getenv("GEMINI_PRICE_GROUNDED_PER_K", "35"))  # per 1000 grounded prompts
+GEMINI_GUILD_DAILY_BUDGET = float(os.getenv("GEMINI_GUILD_DAILY_BUDGET", "0.50"))  # USD per guild per UTC day; 0 = unlimited
+GEMINI_GUILD_BUDGETS = os.getenv("GEMINI_GUILD_BUDGETS", "")  # overrides, "guild_id:usd,guild_id:usd"
+GEMINI_BUDGET_NO_SEARCH_AT = float(os.getenv("GEMINI_BUDGET_NO_SEARCH_AT", "0.5"))
+GEMINI_BUDGET_CACHE_AT = float(os.getenv("GEMINI_BUDGET_CACHE_AT", "0.8"))
+
+
+class BudgetMode(IntEnum):
+    """How much Gemini a guild may still use today, from most to least."""
+    FULL = 0
+    NO_SEARCH = 1      # grounding is the priciest part of a call; drop it first
+    PREFER_CACHE = 2   # serve a cached reply where the caller has one
+    REFUSE = 3         # cached replies only; no new calls until the day rolls over
+
+
+class BudgetExceededError(Exception):
+    """Raised instead of calling Gemini once a guild has spent its daily budget."""
+
+
+def _parse_budgets(spec: str) -> dict[str, float]:
+    budgets = {}
+    for item in spec.split(","):
+        tenant, sep, usd = item.strip().partition(":")
+        if sep:
+            try:
+                budgets[tenant.strip()] = float(usd)
+            except ValueError:
+                print(f"[Gemini usage] ignoring budget override {item!r}")
+    return budgets
+
+
+def _counters() -> dict:
+    return {"calls": 0, "prompt_tokens": 0, "cached_tokens": 0, "output_tokens": 0, "tool_tokens": 0,
+            "grounded": 0, "latency_total": 0.0, "cost_usd": 0.0}
+
+
+class GeminiUsage:
+    """
+    Token, latency and cost accounting for Gemini calls, per call site and
+    per guild, fed from each response's usage metadata.
+
+    Guild spend is also tracked per UTC day against a budget; `mode()` maps
+    the fraction spent onto a BudgetMode so callers degrade step by step
+    instead of switching off at once.
+    """
+
+    def __init__(self, daily_budget: float = GEMINI_GUILD_DAILY_BUDGET, overrides: dict | None = None):
+        self.daily_budget = daily_budget
+        self.overrides = overrides if overrides is not None else _parse_budgets(GEMINI_GUILD_BUDGETS)
+        self._sites = defaultdict(_counters)
+        self._tenants = defaultdict(_counters)
+        self._day = self._today()
+        self._spent_today = defaultdict(float)
+        self._degraded = defaultdict(int)  # "no_search" / "cached" / "refused" -> times served that way
+
+    @staticmethod
+    def _today() -> str:
+        return datetime.now(timezone.utc).strftime("%Y-%m-%d")
+
+    def _roll_day(self) -> None:
+        today = self._today()
+        if today != self._day:
+            self._day = today
+            self._spent_today.clear()
+
+    @staticmethod
+    def cost(prompt_tokens: int, output_tokens: int, grounded: bool, cached_tokens: int = 0) -> float:
+        billed_input = prompt_tokens - cached_tokens + cached_tokens * GEMINI_CACHED_INPUT_FACTOR
+        return (billed_input * GEMINI_PRICE_INPUT_PER_M / 1e6
+                + output_tokens * GEMINI_PRICE_OUTPUT_PER_M / 1e6
+                + (GEMINI_PRICE_GROUNDED_PER_K / 1000 if grounded else 0.0))
+
+    def record(self, site: str, tenant: str | None, usage_metadata, grounded: bool, seconds: float) -> None:
+        """Account one completed call. `usage_metadata` may be None if Gemini sent none."""
+        prompt = getattr(usage_metadata, "prompt_token_count", None) or 0
+        tool = getattr(usage_metadata, "tool_use_prompt_token_count", None) or 0
+        # Part of prompt_token_count that came from a cached prefix
+        cached = getattr(usage_metadata, "cached_content_token_count", None) or 0
+        # Thinking tokens are billed as output
+        output = ((getattr(usage_metadata, "candidates_token_count", None) or 0)
+                  + (getattr(usage_metadata, "thoughts_token_count", None) or 0))
+        cost = self.cost(prompt + tool, output, grounded, cached)
+
+        buckets = [self._sites[site]]
+        if tenant is not None:
+            buckets.append(self._tenants[tenant])
+        for c in buckets:
+            c["calls"] += 1
+            c["prompt_tokens"] += prompt
+            c["cached_tokens"] += cached
+            c["output_tokens"] += output
+            c["tool_tokens"] += tool
+            c["grounded"] += int(grounded)
+            c["latency_total"] += seconds
+            c["cost_usd"] += cost
+
+        if tenant is not None:
+            self._roll_day()
+            self._spent_today[tenant] += cost
+
+    def budget(self, tenant: str | None) -> float:
+        if tenant is None:
+            return 0.0
+        return self.overrides.get(tenant, self.daily_budget)
+
+    def spent_today(self, tenant: str) -> float:
+        self._roll_day()
+        return self._spent_today.get(tenant, 0.0)
+
+    def mode(self, tenant: str | None) -> BudgetMode:
+        budget = self.budget(tenant)
+        if budget <= 0:
+            return BudgetMode.FULL
+        used = self.spent_today(tenant) / budget
+        if used >= 1:
+            return BudgetMode.REFUSE
+        if used >= GEMINI_BUDGET_CACHE_AT:
+            return BudgetMode.PREFER_CACHE
+        if used >= GEMINI_BUDGET_NO_SEARCH_AT:
+            return BudgetMode.NO_SEARCH
+        return BudgetMode.FULL
+
+    def note_degraded(self, how: str) -> None:
+        self._degraded[how] += 1
+
+    @staticmethod
+    def _view(c: dict) -> dict:
+        calls = c["calls"]
+        return {
+            "calls": calls,
+            "prompt_tokens": c["prompt_tokens"],
+            "cached_tokens": c["cached_tokens"],
+            "output_tokens": c["output_tokens"],
+            "grounding_tokens": c["tool_tokens"],
+            "grounded_calls": c["grounded"],
+            "avg_latency_ms": (c["latency_total"] / calls * 1000) if calls else 0.0,
+            "cost_usd": f"{c['cost_usd']:.4f}",  # metrics.render rounds floats to cents
+        }
+
+    def stats(self) -> dict:
+        self._roll_day()
+        # Biggest spenders first; cap the listing so /stats stays readable
+        ordered = sorted(self._tenants, key=lambda t: self._tenants[t]["cost_usd"], reverse=True)
+        return {
+            "sites": {site: self._view(c) for site, c in sorted(self._sites.items())},
+            "guilds": {
+                tenant: {
+                    **self._view(self._tenants[tenant]),
+                    "today_usd": f"{self._spent_today.get(tenant, 0.0):.4f}/{self.budget(tenant) or '∞'}",
+                }
+                for tenant in ordered[:10]
+            },
+            "degraded": dict(self._degraded),
+        }
+
+
+usage = GeminiUsage()
+metrics.register("gemini_usage", usage.stats)
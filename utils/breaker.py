@@ -0,0 +1,183 @@
+import os
+import time
+from collections import deque
+from dotenv import load_dotenv
+
+from utils import metrics
+
+# --- Configuration ---
+load_dotenv()
+BREAKER_FAILURE_RATE = float(os.getenv("BREAKER_FAILURE_RATE", "0.5"))   # trip at >= 50% failures
+BREAKER_WINDOW_SECONDS = float(os.getenv("BREAKER_WINDOW_SECONDS", "60"))
+BREAKER_MIN_REQUESTS = int(os.getenv("BREAKER_MIN_REQUESTS", "5"))       # don't trip on tiny samples
+BREAKER_OPEN_SECONDS = float(os.getenv("BREAKER_OPEN_SECONDS", "30"))    # wait before probing again
+BREAKER_HALF_OPEN_PROBES = int(os.getenv("BREAKER_HALF_OPEN_PROBES", "1"))
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+class CircuitOpenError(Exception):
+    """Raised instead of calling an upstream whose circuit is open."""
+
+    def __init__(self, name: str, retry_after: float):
+        super().__init__(f"{name} is temporarily unavailable (retry in ~{max(1, round(retry_after))}s)")
+        self.name = name
+        self.retry_after = retry_after
+
+
+class CircuitBreaker:
+    """
+    Failure-rate circuit breaker for one upstream.
+
+    Closed: calls pass through; outcomes are kept in a rolling time window.
+    When the window holds at least `min_requests` outcomes and the failure
+    rate reaches `failure_rate`, the circuit opens and calls fail fast with
+    CircuitOpenError. After `open_seconds`, up to `half_open_probes` calls are
+    let through; a successful probe closes the circuit, a failed one reopens it.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        failure_rate: float = BREAKER_FAILURE_RATE,
+        window_seconds: float = BREAKER_WINDOW_SECONDS,
+        min_requests: int = BREAKER_MIN_REQUESTS,
+        open_seconds: float = BREAKER_OPEN_SECONDS,
+        half_open_probes: int = BREAKER_HALF_OPEN_PROBES,
+    ):
+        self.name = name
+        self.failure_rate = failure_rate
+        self.window_seconds = window_seconds
+        self.min_requests = min_requests
+        self.open_seconds = open_seconds
+        self.half_open_probes = max(1, half_open_probes)
+
+        self.state = CLOSED
+        self._outcomes = deque()  # (timestamp, ok)
+        self._opened_at = 0.0
+        self._probes_inflight = 0
+
+        self.times_opened = 0
+        self.fast_fails = 0
+
+    # --- State machine ---
+    def allow(self) -> None:
+        """Reserve permission for one call, or raise CircuitOpenError."""
+        now = time.monotonic()
+        if self.state == OPEN:
+            remaining = self._opened_at + self.open_seconds - now
+            if remaining > 0:
+                self.fast_fails += 1
+                raise CircuitOpenError(self.name, remaining)
+            self.state = HALF_OPEN
+            self._probes_inflight = 0
+
+        if self.state == HALF_OPEN:
+            if self._probes_inflight >= self.half_open_probes:
+                self.fast_fails += 1
+                raise CircuitOpenError(self.name, self.open_seconds)
+            self._probes_inflight += 1
+
+    def record_success(self) -> None:
+        if self.state == HALF_OPEN:
+            self._close()
+            return
+        self._append(True)
+
+    def record_failure(self) -> None:
+        if self.state == HALF_OPEN:
+            self._open()
+            return
+        self._append(False)
+        if self.state == OPEN:
+            # Late result from a call admitted before the circuit opened
+            return
+        total, failures = self._counts()
+        if total >= self.min_requests and failures / total >= self.failure_rate:
+            self._open()
+
+    def release(self) -> None:
+        """Give back a probe slot for a call that ended without a verdict (e.g. cancelled)."""
+        if self.state == HALF_OPEN and self._probes_inflight > 0:
+            self._probes_inflight -= 1
+
+    async def call(self, func, *args, is_failure=None, **kwargs):
+        """
+        Await `func(*args, **kwargs)` under this breaker. `is_failure(exc)` decides
+        whether an exception counts against the upstream (default: all do).
+        """
+        self.allow()
+        try:
+            result = await func(*args, **kwargs)
+        except BaseException as e:
+            if isinstance(e, Exception) and (is_failure is None or is_failure(e)):
+                self.record_failure()
+            elif isinstance(e, Exception):
+                # The upstream answered; the request itself was bad
+                self.record_success()
+            else:
+                self.release()
+            raise
+        self.record_success()
+        return result
+
+    # --- Internals ---
+    def _append(self, ok: bool) -> None:
+        now = time.monotonic()
+        self._outcomes.append((now, ok))
+        self._trim(now)
+
+    def _trim(self, now: float) -> None:
+        cutoff = now - self.window_seconds
+        while self._outcomes and self._outcomes[0][0] < cutoff:
+            self._outcomes.popleft()
+
+    def _counts(self) -> tuple[int, int]:
+        self._trim(time.monotonic())
+        total = len(self._outcomes)
+        failures = sum(1 for _, ok in self._outcomes if not ok)
+        return total, failures
+
+    def _open(self) -> None:
+        if self.state != OPEN:
+            self.times_opened += 1
+            print(f"[Breaker] {self.name} circuit OPEN")
+        self.state = OPEN
+        self._opened_at = time.monotonic()
+        self._probes_inflight = 0
+
+    def _close(self) -> None:
+        print(f"[Breaker] {self.name} circuit closed")
+        self.state = CLOSED
+        self._outcomes.clear()
+        self._probes_inflight = 0
+
+    def stats(self) -> dict:
+        total, failures = self._counts()
+        out = {
+            "state": self.state,
+            "window_requests": total,
+            "failure_rate": failures / total if total else 0.0,
+            "times_opened": self.times_opened,
+            "fast_fails": self.fast_fails,
+        }
+        if self.state == OPEN:
+            out["retry_in_s"] = max(0.0, self._opened_at + self.open_seconds - time.monotonic())
+        return out
+
+
+# --- Registry ---
+_breakers: dict[str, CircuitBreaker] = {}
+
+
+def get_breaker(name: str, **overrides) -> CircuitBreaker:
+    """Return the process-wide breaker for `name`, creating it on first use."""
+    breaker = _breakers.get(name)
+    if breaker is None:
+        breaker = _breakers[name] = CircuitBreaker(name, **overrides)
+    return breaker
+
+
+metrics.register("breakers", lambda: {name: b.stats() for name, b in sorted(_breakers.items())})
@@ -5,6 +5,7 @@ import random
 import time
 
 from utils.dns.cache import get_records, set_records, print_view, purge_expired
+from utils.latency import latency
 
 root_ips = []
 nearest_root = []
@@ -13,6 +14,25 @@ sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
 sock.settimeout(2.0) 
 
 
+def exchange(packet, server_ip, port=53):
+	"""
+	Send one UDP query and wait for the reply. The socket timeout adapts to
+	this server's observed p99 (see utils.latency) instead of a fixed 2 s.
+	"""
+	key = f"dns:{server_ip}"
+	timeout = latency.timeout(key)
+	sock.settimeout(timeout)
+	start = time.perf_counter()
+	try:
+		sock.sendto(packet, (server_ip, port))
+		data, addr = sock.recvfrom(4096)
+	except socket.timeout:
+		latency.observe_timeout(key, timeout)
+		raise
+	latency.observe(key, time.perf_counter() - start)
+	return data, addr
+
+
 def update_root_address():
 	with open("utils/dns/root.hints","r+") as f:
 		nm = f.read().splitlines()
@@ -98,8 +118,7 @@ def check_nearest_root():
 		packet = query(".com",2)
 		# A = 1 ,NS = 2
 		try:
-			addr = sock.sendto(packet, (UDP_IP, UDP_PORT))
-			data, addr = sock.recvfrom(4096)
+			data, addr = exchange(packet, UDP_IP, UDP_PORT)
 
 		except:
 			continue
@@ -242,8 +261,7 @@ def root_server(root_ip,domain):
 	
 
 	# A = 1 ,NS = 2
-	addr = sock.sendto(packet, (UDP_IP, UDP_PORT))
-	data, addr = sock.recvfrom(4096)
+	data, addr = exchange(packet, UDP_IP, UDP_PORT)
 
 	print(f"[+] response from {addr}")
 	print(data)
@@ -287,8 +305,7 @@ def nameserver(name_ips,domain):
 
 	print(packet)
 	try:
-		addr = sock.sendto(packet, (UDP_IP, UDP_PORT))
-		data, addr = sock.recvfrom(4096)
+		data, addr = exchange(packet, UDP_IP, UDP_PORT)
 
 		print(f"[+] response from {addr}")
 		print(data)
@@ -328,8 +345,7 @@ def tld_server(tld_ips,domain,recursive=0):
 	print(packet)
 	# data = ''
 	try:
-		addr = sock.sendto(packet, (UDP_IP, UDP_PORT))
-		data, addr = sock.recvfrom(4096)
+		data, addr = exchange(packet, UDP_IP, UDP_PORT)
 	
 		print(f"[+] response from {addr}")
 	except socket.timeout:
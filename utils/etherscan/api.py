@@ -0,0 +1,123 @@
+# api.py
+import os
+from dotenv import load_dotenv
+
+from utils.rate_limit import TokenBucket
+from utils.request_policy import fetch_json
+
+load_dotenv()
+
+ETHERSCAN_API_KEY = os.getenv("ETHERSCAN_API_KEY")
+ETHERSCAN_RPS = float(os.getenv("ETHERSCAN_RPS", "5"))  # free tier: 5 calls/second
+BASE_URL = "https://api.etherscan.io/v2/api"
+CHAIN_ID = 1  # Ethereum mainnet
+NO_TXS_MESSAGE = "No transactions found"
+RESULT_WINDOW = 10000  # Etherscan caps page * offset at 10k rows per query
+
+
+class EtherscanError(Exception):
+    """Etherscan answered, but with an error (rate limit, bad key, ...)."""
+
+
+# Shared by every Etherscan call so /trap, deep and bulk scans together stay within the plan
+etherscan_budget = TokenBucket(ETHERSCAN_RPS)
+
+
+async def _fetch_txs(http, action: str, address: str, offset: int, page: int = 1,
+                     startblock: int = 0, endblock: int = 99999999):
+    params = {
+        "chainid": CHAIN_ID,
+        "module": "account",
+        "action": action,
+        "address": address,
+        "startblock": startblock,
+        "endblock": endblock,
+        "page": page,
+        "offset": offset,
+        "sort": "desc",
+        "apikey": ETHERSCAN_API_KEY,
+    }
+    # Idempotent read: hedged + retried under the shared retry budget, each send paced by the Etherscan budget
+    data = await fetch_json(http, BASE_URL, params=params, upstream="etherscan", rate=etherscan_budget)
+    if data.get("status") == "1" and isinstance(data.get("result"), list):
+        return data["result"]
+    if str(data.get("message", "")).startswith(NO_TXS_MESSAGE):
+        return []
+    # An error must not look like "no new transactions" to the incremental cache
+    raise EtherscanError(f"{action}: {data.get('message')} {data.get('result')}")
+
+
+async def fetch_latest_normal_txs(http, address: str, limit: int = 9, startblock: int = 0):
+    return await _fetch_txs(http, "txlist", address, limit, startblock=startblock)
+
+
+async def fetch_latest_internal_txs(http, address: str, limit: int = 9, startblock: int = 0):
+    return await _fetch_txs(http, "txlistinternal", address, limit, startblock=startblock)
+
+
+async def _proxy(http, action: str, **params):
+    """Ethereum JSON-RPC through Etherscan's proxy module; returns `result`."""
+    query = {"chainid": CHAIN_ID, "module": "proxy", "action": action, "apikey": ETHERSCAN_API_KEY, **params}
+    data = await fetch_json(http, BASE_URL, params=query, upstream="etherscan", rate=etherscan_budget)
+    result = data.get("result")
+    if "error" in data or data.get("status") == "0" or result is None:
+        raise EtherscanError(f"{action}: {data.get('error') or data.get('result')}")
+    return result
+
+
+async def fetch_block_number(http) -> int:
+    return int(await _proxy(http, "eth_blockNumber"), 16)
+
+
+async def fetch_block_addresses(http, number: int) -> set[str]:
+    """Lowercased from/to of every transaction in block `number`."""
+    block = await _proxy(http, "eth_getBlockByNumber", tag=hex(number), boolean="true")
+    if not isinstance(block, dict):
+        raise EtherscanError(f"eth_getBlockByNumber: unexpected result for block {number}")
+    seen = set()
+    for tx in block.get("transactions", []):
+        for field in ("from", "to"):
+            if tx.get(field):
+                seen.add(tx[field].lower())
+    return seen
+
+
+def _row_key(tx) -> tuple:
+    # Internal txs share their parent's hash, so the hash alone is not unique
+    return (tx.get("hash"), tx.get("traceId"), tx.get("from"), tx.get("to"), tx.get("value"))
+
+
+async def iter_tx_pages(http, action: str, address: str, page_size: int = 1000, max_txs: int = 10000):
+    """
+    Yield pages of an address' transactions, newest first, up to `max_txs`.
+
+    Etherscan only serves the first 10k rows of a query, so once a window is
+    exhausted the walk restarts with endblock set to the lowest block seen,
+    skipping rows from that boundary block that were already yielded.
+    """
+    endblock = 99999999
+    boundary_seen = set()
+    remaining = max_txs
+
+    while remaining > 0:
+        page = 1
+        last_rows = []
+        while page * page_size <= RESULT_WINDOW and remaining > 0:
+            rows = await _fetch_txs(http, action, address, page_size, page=page, endblock=endblock)
+            fresh = [tx for tx in rows if _row_key(tx) not in boundary_seen][:remaining]
+            if fresh:
+                remaining -= len(fresh)
+                yield fresh
+            if len(rows) < page_size:
+                return
+            last_rows = rows
+            page += 1
+
+        if not last_rows:
+            return
+        lowest_block = int(last_rows[-1].get("blockNumber") or 0)
+        if lowest_block >= endblock:
+            # One block holding more than a whole window; nothing sane left to do
+            return
+        boundary_seen = {_row_key(tx) for tx in last_rows if int(tx.get("blockNumber") or 0) == lowest_block}
+        endblock = lowest_block
@@ -0,0 +1,130 @@
+# tx_cache.py
+import os
+import json
+import time
+import lmdb
+import asyncio
+from pathlib import Path
+from typing import Any, Dict, List, Tuple
+from dotenv import load_dotenv
+
+from utils.etherscan.api import fetch_latest_normal_txs, fetch_latest_internal_txs
+
+load_dotenv()
+
+# Path to the project root (adjust .parent levels if needed)
+PROJECT_ROOT = Path(__file__).resolve().parent.parent.parent
+DEFAULT_DIR = str(PROJECT_ROOT / "global_cache" / "etherscan_cache")
+DEFAULT_MAP_SIZE = 64 * 1024 * 1024  # 64 MB
+CACHE_DEPTH = 20  # latest txs kept per kind; matches /trap's max limit
+FRESH_SECONDS = float(os.getenv("ETHERSCAN_CACHE_FRESH_SECONDS", "60"))
+TX_FIELDS = ("hash", "blockNumber", "timeStamp", "value", "from", "to")
+
+
+def _slim(tx: Dict[str, Any]) -> Dict[str, Any]:
+    # Only what the heuristics and reports read; full Etherscan rows are ~1 KB
+    return {k: tx.get(k) for k in TX_FIELDS}
+
+
+def _top_block(txs: List[Dict[str, Any]]) -> int:
+    try:
+        return max(int(tx.get("blockNumber") or 0) for tx in txs)
+    except ValueError:
+        return 0
+
+
+class TxCache:
+    """
+    Per-address cache of the latest normal/internal transactions, the highest
+    block seen for each kind, and verdicts computed from them.
+
+    Refreshing an address asks Etherscan only for blocks after the cached ones
+    (startblock=last+1). Within FRESH_SECONDS of the last check no upstream
+    call is made at all, and verdicts are reused until new transactions arrive.
+    """
+
+    def __init__(self, path: str = DEFAULT_DIR, map_size: int = DEFAULT_MAP_SIZE):
+        os.makedirs(path, exist_ok=True)
+        self.env = lmdb.open(
+            path,
+            map_size=map_size,
+            max_dbs=2,
+            subdir=True,
+            create=True,
+            lock=True,
+            readahead=False,
+        )
+        self.db = self.env.open_db(b"addresses")
+
+    def close(self):
+        self.env.close()
+
+    @staticmethod
+    def _key(address: str) -> bytes:
+        return address.lower().encode("utf-8")
+
+    def get(self, address: str) -> Dict[str, Any] | None:
+        with self.env.begin(db=self.db) as txn:
+            raw = txn.get(self._key(address))
+        if not raw:
+            return None
+        try:
+            return json.loads(raw.decode("utf-8"))
+        except Exception:
+            return None
+
+    def put(self, address: str, entry: Dict[str, Any]) -> None:
+        payload = json.dumps(entry, separators=(",", ":")).encode("utf-8")
+        with self.env.begin(write=True, db=self.db) as txn:
+            txn.put(self._key(address), payload)
+
+    def put_verdict(self, address: str, limit: int, verdict: Dict[str, Any]) -> None:
+        entry = self.get(address)
+        if entry is None:
+            return
+        entry.setdefault("verdicts", {})[str(limit)] = verdict
+        self.put(address, entry)
+
+    @staticmethod
+    def _merge(new: List[Dict[str, Any]], old: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        new = [_slim(tx) for tx in new]
+        if len(new) >= CACHE_DEPTH:
+            # A full page may have skipped txs between it and the cached ones
+            return new[:CACHE_DEPTH]
+        return (new + old)[:CACHE_DEPTH]
+
+    async def refresh(self, http, address: str, fresh_seconds: float = FRESH_SECONDS) -> Tuple[Dict[str, Any], bool]:
+        """
+        Bring the cached entry for `address` up to date.
+        Returns (entry, changed) where `changed` means new transactions arrived.
+        """
+        entry = self.get(address)
+        now = time.time()
+        if entry and now - entry.get("checked_at", 0) < fresh_seconds:
+            return entry, False
+
+        if entry is None:
+            entry = {
+                "normal": [], "internal": [],
+                "normal_block": -1, "internal_block": -1,
+                "checked_at": 0, "verdicts": {},
+            }
+
+        new_normal, new_internal = await asyncio.gather(
+            fetch_latest_normal_txs(http, address, CACHE_DEPTH, startblock=entry["normal_block"] + 1),
+            fetch_latest_internal_txs(http, address, CACHE_DEPTH, startblock=entry["internal_block"] + 1),
+        )
+
+        changed = bool(new_normal or new_internal)
+        if new_normal:
+            entry["normal"] = self._merge(new_normal, entry["normal"])
+            entry["normal_block"] = max(entry["normal_block"], _top_block(new_normal))
+        if new_internal:
+            entry["internal"] = self._merge(new_internal, entry["internal"])
+            entry["internal_block"] = max(entry["internal_block"], _top_block(new_internal))
+        if changed:
+            entry["verdicts"] = {}
+        entry["checked_at"] = now
+
+        self.put(address, entry)
+        return entry, changed
@@ -0,0 +1,112 @@
+# watchlist.py
+import os
+import json
+import time
+import lmdb
+from pathlib import Path
+from typing import Any, Dict, List
+
+# Path to the project root (adjust .parent levels if needed)
+PROJECT_ROOT = Path(__file__).resolve().parent.parent.parent
+DEFAULT_DIR = str(PROJECT_ROOT / "global_cache" / "trap_watchlist")
+DEFAULT_MAP_SIZE = 16 * 1024 * 1024  # 16 MB
+LAST_BLOCK_KEY = b"last_block"
+
+
+class WatchList:
+    """
+    Addresses under continuous /trap monitoring, one LMDB record each:
+
+        {"channels": {guild_id: channel_id}, "matches": int, "alerted": bool, "added_at": ts}
+
+    `matches` is the running pair count, grown incrementally as new
+    transactions arrive, and `alerted` makes the threshold alert fire once.
+    The last processed block number lives in a separate meta sub-database.
+    """
+
+    def __init__(self, path: str = DEFAULT_DIR, map_size: int = DEFAULT_MAP_SIZE):
+        os.makedirs(path, exist_ok=True)
+        self.env = lmdb.open(
+            path,
+            map_size=map_size,
+            max_dbs=2,
+            subdir=True,
+            create=True,
+            lock=True,
+            readahead=False,
+        )
+        self.db = self.env.open_db(b"watch")
+        self.meta_db = self.env.open_db(b"meta")
+
+    def close(self):
+        self.env.close()
+
+    @staticmethod
+    def _key(address: str) -> bytes:
+        return address.lower().encode("utf-8")
+
+    def get(self, address: str) -> Dict[str, Any] | None:
+        with self.env.begin(db=self.db) as txn:
+            raw = txn.get(self._key(address))
+        if not raw:
+            return None
+        try:
+            return json.loads(raw.decode("utf-8"))
+        except Exception:
+            return None
+
+    def put(self, address: str, entry: Dict[str, Any]) -> None:
+        payload = json.dumps(entry, separators=(",", ":")).encode("utf-8")
+        with self.env.begin(write=True, db=self.db) as txn:
+            txn.put(self._key(address), payload)
+
+    def items(self) -> List[tuple[str, Dict[str, Any]]]:
+        out = []
+        with self.env.begin(db=self.db) as txn:
+            for key, raw in txn.cursor():
+                try:
+                    out.append((key.decode("utf-8"), json.loads(raw.decode("utf-8"))))
+                except Exception:
+                    continue
+        return out
+
+    def addresses(self) -> set[str]:
+        with self.env.begin(db=self.db) as txn:
+            return {key.decode("utf-8") for key in txn.cursor().iternext(values=False)}
+
+    def for_guild(self, guild_id: int) -> List[tuple[str, Dict[str, Any]]]:
+        gid = str(guild_id)
+        return [(a, e) for a, e in self.items() if gid in e.get("channels", {})]
+
+    def add(self, address: str, guild_id: int, channel_id: int, matches: int, alerted: bool) -> bool:
+        """Subscribe a guild channel to `address`. Returns False if it was already watched there."""
+        entry = self.get(address)
+        if entry is None:
+            entry = {"channels": {}, "matches": matches, "alerted": alerted, "added_at": int(time.time())}
+        gid = str(guild_id)
+        if gid in entry["channels"]:
+            return False
+        entry["channels"][gid] = channel_id
+        self.put(address, entry)
+        return True
+
+    def remove(self, address: str, guild_id: int) -> bool:
+        entry = self.get(address)
+        if entry is None or entry["channels"].pop(str(guild_id), None) is None:
+            return False
+        if entry["channels"]:
+            self.put(address, entry)
+        else:
+            with self.env.begin(write=True, db=self.db) as txn:
+                txn.delete(self._key(address))
+        return True
+
+    # --- Poll cursor ---
+    def last_block(self) -> int | None:
+        with self.env.begin(db=self.meta_db) as txn:
+            raw = txn.get(LAST_BLOCK_KEY)
+        return int(raw) if raw else None
+
+    def set_last_block(self, block: int) -> None:
+        with self.env.begin(write=True, db=self.meta_db) as txn:
+            txn.put(LAST_BLOCK_KEY, str(block).encode("utf-8"))
@@ -0,0 +1,72 @@
+# window_join.py
+from array import array
+from bisect import bisect_left, bisect_right
+from typing import Any, Dict, Iterable
+
+TS_BITS = 32  # unix timestamps fit in 32 bits until 2106
+
+
+class InternalIndex:
+    """
+    Compact, sorted index of internal transactions for the value/time window join.
+
+    Each tx becomes one int64 key: (value_code << 32) | timestamp, where
+    value_code interns the wei string. Equal values then occupy one contiguous
+    run sorted by time, so "same value and |dt| <= radius" is a single range
+    lookup: [key - radius, key + radius]. Memory is 8 bytes per tx plus one
+    dict entry per distinct value.
+    """
+
+    def __init__(self):
+        self.value_codes: Dict[str, int] = {}
+        self._keys = array("q")
+        self._sorted = True
+
+    def __len__(self) -> int:
+        return len(self._keys)
+
+    def add(self, txs: Iterable[Dict[str, Any]]) -> None:
+        for tx in txs:
+            val = tx.get("value")
+            if not val:
+                continue
+            try:
+                ts = int(tx.get("timeStamp", "0"))
+            except ValueError:
+                continue
+            code = self.value_codes.setdefault(val, len(self.value_codes))
+            self._keys.append((code << TS_BITS) | ts)
+        self._sorted = False
+
+    def freeze(self) -> None:
+        if not self._sorted:
+            self._keys = array("q", sorted(self._keys))
+            self._sorted = True
+
+    def count_matches(self, normal_txs: Iterable[Dict[str, Any]], radius_seconds: int = 60) -> tuple[int, int]:
+        """
+        Join a batch of normal txs against the index.
+        Returns (matched_pairs, normal_txs_with_a_match); same pairing rule as
+        compare_txs_by_amount_and_timestamp in cogs/trap.py.
+        """
+        self.freeze()
+        keys = self._keys
+        pairs = 0
+        matched_normals = 0
+        for ntx in normal_txs:
+            val = ntx.get("value")
+            if not val:
+                continue
+            code = self.value_codes.get(val)
+            if code is None:
+                continue
+            try:
+                ts = int(ntx.get("timeStamp", "0"))
+            except ValueError:
+                continue
+            key = (code << TS_BITS) | ts
+            hits = bisect_right(keys, key + radius_seconds) - bisect_left(keys, key - radius_seconds)
+            if hits:
+                pairs += hits
+                matched_normals += 1
+        return pairs, matched_normals
@@ -0,0 +1,202 @@
+import os
+import asyncio
+from collections import defaultdict
+from urllib.parse import urlparse
+from dotenv import load_dotenv
+
+import aiohttp
+
+from utils import metrics
+from utils.breaker import get_breaker
+from utils.latency import latency
+from utils.resolver import CachingResolver
+
+# --- Configuration ---
+load_dotenv()
+HTTP_POOL_LIMIT = int(os.getenv("HTTP_POOL_LIMIT", "100"))         # total open sockets
+HTTP_POOL_PER_HOST = int(os.getenv("HTTP_POOL_PER_HOST", "10"))    # keep-alive pool per host
+HTTP_KEEPALIVE_SECONDS = float(os.getenv("HTTP_KEEPALIVE_SECONDS", "60"))
+USER_AGENT = "shunya-bot (+https://github.com/0-harshit-0/shunya)"
+
+
+class UpstreamError(Exception):
+    """Raised for HTTP error statuses (>= 400) returned by an upstream API."""
+
+    def __init__(self, upstream: str, status: int, body: str):
+        super().__init__(f"{upstream} returned HTTP {status}")
+        self.upstream = upstream
+        self.status = status
+        self.body = body
+
+
+def is_upstream_failure(e: Exception) -> bool:
+    """Whether an exception means the upstream is unhealthy (vs. a bad request)."""
+    if isinstance(e, UpstreamError):
+        return e.status >= 500 or e.status == 429
+    return True
+
+
+class HttpClient:
+    """
+    Bot-lifetime async HTTP client shared by every cog.
+
+    One aiohttp session with keep-alive connection pools per host, the shared
+    DNS cache (utils.resolver) and gzip/deflate negotiation, so repeated calls to the same API reuse
+    warm TLS connections instead of handshaking every time. Request timings are
+    published to metrics and to any registered timing hooks.
+    """
+
+    def __init__(self):
+        self.session: aiohttp.ClientSession | None = None
+        self._timing_hooks = []
+        self._stats = defaultdict(lambda: {
+            "requests": 0, "errors": 0, "new_conns": 0, "reused_conns": 0,
+            "total_ms": 0.0, "last_ms": 0.0,
+        })
+        metrics.register("http", self.stats)
+        self.add_timing_hook(self._observe_latency)
+
+    async def start(self) -> None:
+        if self.session is not None and not self.session.closed:
+            return
+
+        connector = aiohttp.TCPConnector(
+            limit=HTTP_POOL_LIMIT,
+            limit_per_host=HTTP_POOL_PER_HOST,
+            keepalive_timeout=HTTP_KEEPALIVE_SECONDS,
+            # Name lookups go through the process-wide cache shared with /ping
+            resolver=CachingResolver(),
+            use_dns_cache=False,
+            enable_cleanup_closed=True,
+        )
+
+        trace = aiohttp.TraceConfig()
+        trace.on_request_start.append(self._on_request_start)
+        trace.on_request_end.append(self._on_request_end)
+        trace.on_request_exception.append(self._on_request_exception)
+        trace.on_connection_create_end.append(self._on_connection_create)
+        trace.on_connection_reuseconn.append(self._on_connection_reuse)
+
+        self.session = aiohttp.ClientSession(
+            connector=connector,
+            trace_configs=[trace],
+            auto_decompress=True,
+            headers={
+                "Accept-Encoding": "gzip, deflate",
+                "User-Agent": USER_AGENT,
+            },
+        )
+
+    async def close(self) -> None:
+        if self.session is not None and not self.session.closed:
+            await self.session.close()
+        self.session = None
+
+    def add_timing_hook(self, hook) -> None:
+        """Register `hook(upstream, method, elapsed_seconds, status_or_None)`."""
+        self._timing_hooks.append(hook)
+
+    @staticmethod
+    def _observe_latency(upstream: str, method: str, elapsed: float, status: int | None) -> None:
+        # Only healthy responses describe the upstream's normal latency
+        if status is not None and status < 400:
+            latency.observe(upstream, elapsed)
+
+    # --- Requests ---
+    async def get_json(
+        self,
+        url: str,
+        *,
+        params: dict | None = None,
+        headers: dict | None = None,
+        timeout: float | None = None,
+        upstream: str | None = None,
+    ):
+        """
+        GET `url` and decode the JSON body; raises UpstreamError on HTTP >= 400.
+        Calls are guarded by the upstream's circuit breaker, so an upstream
+        that keeps failing raises CircuitOpenError immediately. Without an
+        explicit `timeout`, the upstream's adaptive (p99-based) timeout is used.
+        """
+        if self.session is None or self.session.closed:
+            await self.start()
+
+        upstream = upstream or urlparse(url).hostname or "unknown"
+        if timeout is None:
+            timeout = latency.timeout(upstream)
+        return await get_breaker(upstream).call(
+            self._get_json, upstream, url, params, headers, timeout,
+            is_failure=is_upstream_failure,
+        )
+
+    async def _get_json(self, upstream: str, url: str, params, headers, timeout: float):
+        try:
+            async with self.session.get(
+                url,
+                params=params,
+                headers=headers,
+                timeout=aiohttp.ClientTimeout(total=timeout),
+                trace_request_ctx={"upstream": upstream},
+            ) as resp:
+                if resp.status >= 400:
+                    raise UpstreamError(upstream, resp.status, await resp.text())
+                return await resp.json(content_type=None)
+        except asyncio.TimeoutError:
+            latency.observe_timeout(upstream, timeout)
+            raise
+
+    # --- Metrics ---
+    def stats(self) -> dict:
+        out = {}
+        for upstream, s in sorted(self._stats.items()):
+            done = s["requests"]
+            out[upstream] = {
+                "requests": done,
+                "errors": s["errors"],
+                "new_conns": s["new_conns"],
+                "reused_conns": s["reused_conns"],
+                "avg_ms": s["total_ms"] / done if done else 0.0,
+                "last_ms": s["last_ms"],
+            }
+        return out
+
+    # --- Trace hooks ---
+    @staticmethod
+    def _upstream_of(ctx) -> str:
+        req_ctx = ctx.trace_request_ctx or {}
+        return req_ctx.get("upstream", "unknown")
+
+    async def _on_request_start(self, session, ctx, params):
+        ctx.start = asyncio.get_running_loop().time()
+
+    async def _on_request_end(self, session, ctx, params):
+        self._record(ctx, params.method, params.response.status)
+
+    async def _on_request_exception(self, session, ctx, params):
+        self._record(ctx, params.method, None)
+
+    async def _on_connection_create(self, session, ctx, params):
+        self._stats[self._upstream_of(ctx)]["new_conns"] += 1
+
+    async def _on_connection_reuse(self, session, ctx, params):
+        self._stats[self._upstream_of(ctx)]["reused_conns"] += 1
+
+    def _record(self, ctx, method: str, status: int | None) -> None:
+        start = getattr(ctx, "start", None)
+        if start is None:
+            return
+        elapsed = asyncio.get_running_loop().time() - start
+        upstream = self._upstream_of(ctx)
+
+        s = self._stats[upstream]
+        s["requests"] += 1
+        s["total_ms"] += elapsed * 1000
+        s["last_ms"] = elapsed * 1000
+        if status is None or status >= 400:
+            s["errors"] += 1
+
+        for hook in self._timing_hooks:
+            try:
+                hook(upstream, method, elapsed, status)
+            except Exception as e:
+                print(f"[HttpClient] timing hook failed: {e}")
@@ -0,0 +1,94 @@
+import os
+from collections import OrderedDict, deque
+from dotenv import load_dotenv
+
+from utils import metrics
+
+# --- Configuration ---
+load_dotenv()
+LATENCY_WINDOW = int(os.getenv("LATENCY_WINDOW", "200"))          # samples kept per key
+LATENCY_MIN_SAMPLES = int(os.getenv("LATENCY_MIN_SAMPLES", "20"))  # below this, percentiles are unknown
+LATENCY_MAX_KEYS = int(os.getenv("LATENCY_MAX_KEYS", "1000"))       # LRU cap (ping/dns keys are open-ended)
+TIMEOUT_MARGIN = float(os.getenv("TIMEOUT_MARGIN", "0.5"))          # timeout = p99 * (1 + margin)
+
+# Timeout profile per upstream kind: (default while learning, floor, ceiling) in seconds.
+# Keys like "dns:198.41.0.4" or "ping:example.com" use the profile before the colon.
+TIMEOUT_PROFILES = {
+    "etherscan": (10.0, 1.0, 10.0),
+    "nasa": (15.0, 2.0, 15.0),
+    "tarotapi": (10.0, 1.0, 10.0),
+    "shodan": (15.0, 2.0, 20.0),
+    "gemini": (float(os.getenv("GEMINI_TIMEOUT", "30")), 5.0, 60.0),
+    "dns": (2.0, 0.3, 3.0),
+    "ping": (5.0, 1.0, 5.0),
+    "ping_read": (3.0, 0.5, 3.0),
+}
+DEFAULT_PROFILE = (10.0, 1.0, 15.0)
+
+
+class LatencyTracker:
+    """
+    Rolling window of recent latencies (seconds) per upstream key, and the
+    adaptive timeouts derived from them: p99 plus a margin, clamped to the
+    key's profile floor/ceiling. Until enough samples exist the profile's
+    default is used.
+    """
+
+    def __init__(self, window: int = LATENCY_WINDOW, min_samples: int = LATENCY_MIN_SAMPLES,
+                 max_keys: int = LATENCY_MAX_KEYS):
+        self.window = window
+        self.min_samples = min_samples
+        self.max_keys = max_keys
+        self._samples: OrderedDict[str, deque] = OrderedDict()
+
+    def observe(self, key: str, seconds: float) -> None:
+        samples = self._samples.get(key)
+        if samples is None:
+            samples = self._samples[key] = deque(maxlen=self.window)
+            if len(self._samples) > self.max_keys:
+                self._samples.popitem(last=False)
+        else:
+            self._samples.move_to_end(key)
+        samples.append(seconds)
+
+    def observe_timeout(self, key: str, timeout: float) -> None:
+        """
+        Record a timed-out call as a sample at the timeout value. Without this a
+        slowing upstream would never raise its own p99 and stay stuck failing.
+        """
+        self.observe(key, timeout)
+
+    def timeout(self, key: str) -> float:
+        default, floor, ceiling = TIMEOUT_PROFILES.get(key.split(":", 1)[0], DEFAULT_PROFILE)
+        p99 = self.percentile(key, 99)
+        if p99 is None:
+            return default
+        return min(ceiling, max(floor, p99 * (1 + TIMEOUT_MARGIN)))
+
+    def percentile(self, key: str, pct: float) -> float | None:
+        """Nearest-rank percentile, or None while there are too few samples."""
+        samples = self._samples.get(key)
+        if not samples or len(samples) < self.min_samples:
+            return None
+        ordered = sorted(samples)
+        idx = min(len(ordered) - 1, max(0, round(pct / 100 * len(ordered)) - 1))
+        return ordered[idx]
+
+    def stats(self) -> dict:
+        out = {}
+        # Only the upstream APIs; per-host ping/dns keys would flood /stats
+        for key, samples in sorted(self._samples.items()):
+            if ":" in key:
+                continue
+            entry = {"samples": len(samples)}
+            for pct in (50, 95, 99):
+                value = self.percentile(key, pct)
+                entry[f"p{pct}_ms"] = value * 1000 if value is not None else "n/a"
+            entry["timeout_s"] = self.timeout(key)
+            out[key] = entry
+        return out
+
+
+# Process-wide tracker; HttpClient feeds it from its timing hooks
+latency = LatencyTracker()
+metrics.register("latency", latency.stats)
@@ -0,0 +1,37 @@
+from typing import Any, Callable, Dict
+
+# --- Metrics Registry ---
+# Subsystems register a zero-argument callable that returns a (possibly nested)
+# dict of their current counters/gauges. `/stats` renders the combined snapshot.
+_providers: Dict[str, Callable[[], Dict[str, Any]]] = {}
+
+
+def register(name: str, provider: Callable[[], Dict[str, Any]]) -> None:
+    """Register (or replace) a metrics provider under `name`."""
+    _providers[name] = provider
+
+
+def snapshot() -> Dict[str, Any]:
+    """Collect the current values from every registered provider."""
+    out = {}
+    for name, provider in sorted(_providers.items()):
+        try:
+            out[name] = provider()
+        except Exception as e:
+            out[name] = {"error": f"{type(e).__name__}: {e}"}
+    return out
+
+
+def render(data: Dict[str, Any], indent: int = 0) -> list[str]:
+    """Flatten a nested metrics dict into indented `key: value` lines."""
+    lines = []
+    pad = "  " * indent
+    for key, value in data.items():
+        if isinstance(value, dict):
+            lines.append(f"{pad}{key}:")
+            lines.extend(render(value, indent + 1))
+        elif isinstance(value, float):
+            lines.append(f"{pad}{key}: {value:.2f}")
+        else:
+            lines.append(f"{pad}{key}: {value}")
+    return lines
@@ -0,0 +1,280 @@
+# probe.py
+import ssl
+import math
+import asyncio
+import socket
+import ipaddress
+import contextlib
+from urllib.parse import urlparse
+
+from utils.latency import latency
+from utils.resolver import dns_cache
+
+PING_SAMPLE_INTERVAL = 0.2  # seconds between sample launches
+TLS_CONTEXT = ssl.create_default_context()
+
+
+class ProbeError(Exception):
+    """A probe could not start (bad name, disallowed address); str() is the user-facing message."""
+
+
+def parse_target(raw: str) -> tuple[str, int, bool] | None:
+    """
+    (host, port, tls) from `host`, `host:port` or a URL. Bare hosts are
+    treated as https; http defaults to port 80, https to 443.
+    """
+    raw_input = raw.strip()
+
+    # Normalise to a URL so urlparse works
+    if not raw_input.startswith(("http://", "https://")):
+        url = "https://" + raw_input
+    else:
+        url = raw_input
+
+    try:
+        parsed = urlparse(url)
+        port = parsed.port
+    except ValueError:
+        return None
+
+    host = parsed.hostname
+    if not host:
+        return None
+
+    # Default ports if none provided
+    if port is None:
+        if parsed.scheme == "http":
+            port = 80
+        else:
+            port = 443
+    return host, port, parsed.scheme == "https"
+
+
+def summarize(results: list) -> dict:
+    """min/avg/median/p95/stddev in ms plus loss, from connect times (seconds) and exceptions."""
+    times = sorted(r * 1000 for r in results if isinstance(r, float))
+    sent, received = len(results), len(times)
+    stats = {"sent": sent, "received": received, "loss": 1 - received / sent if sent else 0.0}
+    if not times:
+        return stats
+    avg = sum(times) / received
+    stats.update(
+        min=times[0],
+        avg=avg,
+        median=times[(received - 1) // 2],
+        p95=times[max(0, math.ceil(0.95 * received) - 1)],  # nearest rank
+        stddev=math.sqrt(sum((t - avg) ** 2 for t in times) / received),
+    )
+    return stats
+
+
+async def read_response_head(host: str, reader: asyncio.StreamReader) -> tuple[bytes, float] | None:
+    """First chunk (up to 4 KiB) of the HTTP response and the seconds until it arrived (TTFB)."""
+    key = f"ping_read:{host}"
+    timeout = latency.timeout(key)
+    loop = asyncio.get_running_loop()
+    start = loop.time()
+    try:
+        # Read up to first 4 KiB of the HTTP response
+        data = await asyncio.wait_for(reader.read(4096), timeout=timeout)
+    except asyncio.TimeoutError:
+        latency.observe_timeout(key, timeout)
+        return None
+    except Exception:
+        return None
+    elapsed = loop.time() - start
+    latency.observe(key, elapsed)
+    return data, elapsed
+
+
+def detect_proxy(data: bytes) -> str | None:
+    """
+    Best-effort detection of a common HTTP reverse proxy/CDN
+    from the response headers.
+    """
+    headers = data.decode(errors="ignore").lower()
+
+    # Very simple Cloudflare detection heuristics
+    if "server: cloudflare" in headers or "cf-ray:" in headers or "cf-cache-status:" in headers:
+        return "Cloudflare"
+    if "x-amz-cf-id:" in headers or ".cloudfront.net" in headers:
+        return "CloudFront"
+    if "x-served-by: cache-" in headers or "x-fastly-request-id:" in headers:
+        return "Fastly"
+    if "server: akamaighost" in headers or "x-akamai-transformed:" in headers:
+        return "Akamai"
+
+    # You could add more CDNs here based on their `Server` or custom headers.
+    return None
+
+
+async def connect_once(host: str, ip: str, port: int) -> float:
+    """One TCP connect; returns seconds taken. Raises TimeoutError/OSError on loss."""
+    latency_key = f"ping:{host}"
+    timeout = latency.timeout(latency_key)
+    loop = asyncio.get_running_loop()
+    start = loop.time()
+    try:
+        _reader, writer = await asyncio.wait_for(asyncio.open_connection(ip, port), timeout=timeout)
+    except asyncio.TimeoutError:
+        latency.observe_timeout(latency_key, timeout)
+        raise
+    elapsed = loop.time() - start
+    latency.observe(latency_key, elapsed)
+    writer.close()
+    with contextlib.suppress(Exception):
+        await writer.wait_closed()
+    return elapsed
+
+
+async def sample(host: str, ips: list[str], port: int, count: int) -> dict:
+    """
+    `count` rounds of concurrent connects to every address in `ips` (at
+    most one per family). Rounds start PING_SAMPLE_INTERVAL apart but do
+    not wait for each other, so a slow sample never delays the next.
+    Returns {ip: [seconds or exception, ...]}.
+    """
+    async def delayed(i: int, ip: str):
+        await asyncio.sleep(i * PING_SAMPLE_INTERVAL)
+        return await connect_once(host, ip, port)
+
+    jobs = [(ip, delayed(i, ip)) for i in range(count) for ip in ips]
+    outcomes = await asyncio.gather(*(job for _, job in jobs), return_exceptions=True)
+    samples = {ip: [] for ip in ips}
+    for (ip, _), outcome in zip(jobs, outcomes):
+        samples[ip].append(outcome)
+    return samples
+
+
+async def phase_check(host: str, ip: str, port: int, tls: bool) -> dict:
+    """
+    One connection with each phase timed separately: TCP connect on a raw
+    socket, then the TLS handshake (with SNI) on top of it, then time to
+    first byte of the response to a tiny HEAD request. The response headers
+    feed the proxy/CDN detection, over HTTPS as well as plain HTTP.
+    """
+    phases = {"tcp_ms": None, "tls_ms": None, "ttfb_ms": None, "proxy": None, "error": None}
+    loop = asyncio.get_running_loop()
+    timeout = latency.timeout(f"ping:{host}")
+    family = socket.AF_INET6 if ":" in ip else socket.AF_INET
+
+    sock = socket.socket(family, socket.SOCK_STREAM)
+    sock.setblocking(False)
+    writer = None
+    try:
+        start = loop.time()
+        await asyncio.wait_for(loop.sock_connect(sock, (ip, port)), timeout=timeout)
+        phases["tcp_ms"] = (loop.time() - start) * 1000
+
+        if tls:
+            start = loop.time()
+            reader, writer = await asyncio.open_connection(
+                sock=sock, ssl=TLS_CONTEXT, server_hostname=host, ssl_handshake_timeout=timeout,
+            )
+            phases["tls_ms"] = (loop.time() - start) * 1000
+        else:
+            reader, writer = await asyncio.open_connection(sock=sock)
+
+        http_request = (
+            f"HEAD / HTTP/1.1\r\n"
+            f"Host: {host}\r\n"
+            f"Connection: close\r\n"
+            f"\r\n"
+        ).encode("ascii", errors="ignore")
+        writer.write(http_request)
+        await writer.drain()
+
+        head = await read_response_head(host, reader)
+        if head is not None:
+            data, elapsed = head
+            phases["ttfb_ms"] = elapsed * 1000
+            phases["proxy"] = detect_proxy(data)
+    except ssl.SSLCertVerificationError as e:
+        phases["error"] = f"TLS certificate rejected ({e.verify_message})"
+    except ssl.SSLError as e:
+        phases["error"] = f"TLS handshake failed ({e.reason or e})"
+    except asyncio.TimeoutError:
+        phases["error"] = "TLS handshake timed out" if phases["tcp_ms"] is not None else "connect timed out"
+    except OSError as e:
+        phases["error"] = f"connection failed ({e.strerror or e})"
+    finally:
+        # Cleanly close connection
+        if writer is not None:
+            writer.close()
+            with contextlib.suppress(Exception):
+                await writer.wait_closed()
+        else:
+            sock.close()
+    return phases
+
+
+async def resolve(host: str, port: int) -> list[str]:
+    """First allowed address of each family, in resolver order (the order happy eyeballs would try)."""
+    try:
+        addrinfo = await dns_cache.getaddrinfo(host, port)
+    except socket.gaierror as e:
+        print(e)
+        raise ProbeError(f"❌ DNS resolution failed for `{host}`")
+    except Exception as e:
+        print(e)
+        raise ProbeError(f"❌ Unexpected error while resolving `{host}`")
+
+    if not addrinfo:
+        raise ProbeError(f"❌ Could not resolve hostname `{host}`.")
+
+    candidates = {}
+    for family, socktype, proto, canonname, sockaddr in addrinfo:
+        ip_address = sockaddr[0]
+        try:
+            ip_obj = ipaddress.ip_address(ip_address)
+        except ValueError:
+            raise ProbeError("❌ Failed to parse the resolved IP address.")
+        if (
+            ip_obj.is_loopback
+            or ip_obj.is_private
+            or ip_obj.is_link_local
+            or ip_obj.is_reserved
+            or ip_obj.is_multicast
+        ):
+            # Any disallowed answer rejects the host, so a mixed record set can't sneak through
+            raise ProbeError("❌ Target IP address not allowed.") # (private, loopback, or reserved addresses)
+        candidates.setdefault(family, ip_address)
+    return list(candidates.values())
+
+
+async def probe(host: str, port: int, count: int = 1, tls: bool | None = None) -> dict:
+    """
+    Resolve, sample and (when reachable) phase-check one endpoint.
+    Returns {"ips", "dns_ms", "dns_cached", "summaries", "best", "phases", "proxy", "timed_out"};
+    raises ProbeError with a user-facing message when it can't even start.
+    `tls` defaults to every port except 80.
+    """
+    if tls is None:
+        tls = port != 80
+    dns_cached = dns_cache.cached(host)
+    loop = asyncio.get_running_loop()
+    start = loop.time()
+    ips = await resolve(host, port)
+    dns_ms = (loop.time() - start) * 1000
+    samples = await sample(host, ips, port, count)
+    summaries = {ip: summarize(results) for ip, results in samples.items()}
+    reachable = [ip for ip in ips if summaries[ip]["received"]]
+
+    result = {
+        "ips": ips, "dns_ms": dns_ms, "dns_cached": dns_cached, "summaries": summaries,
+        "best": None, "phases": None, "proxy": None, "timed_out": False,
+    }
+    if not reachable:
+        errors = [r for results in samples.values() for r in results]
+        result["timed_out"] = all(isinstance(r, asyncio.TimeoutError) for r in errors)
+        for r in errors:
+            if not isinstance(r, asyncio.TimeoutError):
+                print(r)
+                break
+        return result
+
+    # Winner of the race: lowest median connect time
+    result["best"] = min(reachable, key=lambda ip: summaries[ip]["median"])
+    result["phases"] = await phase_check(host, result["best"], port, tls)
+    result["proxy"] = result["phases"]["proxy"]
+    return result
@@ -0,0 +1,61 @@
+import os
+import time
+import discord
+from dotenv import load_dotenv
+
+# --- Configuration ---
+load_dotenv()
+STREAM_EDIT_SECONDS = float(os.getenv("STREAM_EDIT_SECONDS", "1.0"))  # Discord allows ~5 edits / 5 s per channel
+MESSAGE_LIMIT = 2000
+
+
+class ProgressiveMessage:
+    """
+    Grows one Discord message as streamed text arrives. The message is posted
+    with the first chunk (or an existing one is reused) and then edited at
+    most once per `interval`; `finish()` always writes the complete text.
+    """
+
+    def __init__(self, send=None, message: discord.Message | None = None, interval: float = STREAM_EDIT_SECONDS):
+        self.send = send
+        self.message = message
+        self.interval = interval
+        self.text = ""
+        self._shown = ""
+        self._last_edit = 0.0
+
+    def _render(self) -> str:
+        if len(self.text) > MESSAGE_LIMIT:
+            return self.text[:MESSAGE_LIMIT - 1] + "…"
+        return self.text
+
+    async def _flush(self, content: str | None = None) -> None:
+        content = self._render() if content is None else content
+        if not content.strip() or content == self._shown:
+            return
+        if self.message is None:
+            self.message = await self.send(content)
+        else:
+            try:
+                await self.message.edit(content=content)
+            except discord.HTTPException as e:
+                # A dropped intermediate edit is fine; the next one carries all the text
+                print(f"[ProgressiveMessage] edit failed: {e}")
+                return
+        self._shown = content
+        self._last_edit = time.monotonic()
+
+    async def append(self, chunk: str) -> None:
+        self.text += chunk
+        # First content goes out immediately; later edits are throttled
+        if not self._shown or time.monotonic() - self._last_edit >= self.interval:
+            await self._flush()
+
+    async def finish(self, fallback: str | None = "No response.") -> str:
+        """Write out the complete text and return it; an empty stream shows `fallback` (if any) and returns ""."""
+        if self.text.strip():
+            await self._flush()
+            return self.text
+        if fallback:
+            await self._flush(fallback)
+        return ""
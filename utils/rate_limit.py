@@ -1,4 +1,5 @@
 import time
+import asyncio
 from collections import defaultdict
 
 # --- Rate Limiting Variables ---
@@ -46,3 +47,33 @@ async def handle_rate_limit(ctx):
     user_last_request_times[user_id].append(current_time)
     user_daily_request_count[user_id] += 1
     return True
+
+
+class TokenBucket:
+    """
+    Async token bucket for upstream API rate budgets: refills at `rate` tokens
+    per second and allows bursts of up to `capacity`. Callers wait their turn
+    instead of getting rejected.
+    """
+
+    def __init__(self, rate: float, capacity: float | None = None):
+        self.rate = rate
+        self.capacity = capacity if capacity is not None else max(1.0, rate)
+        self.tokens = self.capacity
+        self._last = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self._last) * self.rate)
+        self._last = now
+
+    async def acquire(self, tokens: float = 1.0) -> None:
+        # The lock keeps waiters FIFO so a burst can't starve earlier callers
+        async with self._lock:
+            while True:
+                self._refill()
+                if self.tokens >= tokens:
+                    self.tokens -= tokens
+                    return
+                await asyncio.sleep((tokens - self.tokens) / self.rate)
@@ -0,0 +1,154 @@
+import os
+import time
+import asyncio
+from dotenv import load_dotenv
+from tenacity import AsyncRetrying, retry_if_exception, stop_after_attempt, stop_any, wait_random_exponential
+
+from utils import metrics
+from utils.breaker import CircuitOpenError
+from utils.http_client import is_upstream_failure
+from utils.latency import latency
+
+# --- Configuration ---
+load_dotenv()
+POLICY_MAX_ATTEMPTS = int(os.getenv("POLICY_MAX_ATTEMPTS", "3"))
+POLICY_BACKOFF_BASE = float(os.getenv("POLICY_BACKOFF_BASE", "0.2"))    # seconds
+POLICY_BACKOFF_CAP = float(os.getenv("POLICY_BACKOFF_CAP", "2.0"))      # seconds
+POLICY_HEDGE_PERCENTILE = float(os.getenv("POLICY_HEDGE_PERCENTILE", "95"))
+POLICY_HEDGE_MIN_DELAY = float(os.getenv("POLICY_HEDGE_MIN_DELAY", "0.05"))
+RETRY_BUDGET_RATIO = float(os.getenv("RETRY_BUDGET_RATIO", "0.1"))      # extra sends per request
+RETRY_BUDGET_MIN_PER_SEC = float(os.getenv("RETRY_BUDGET_MIN_PER_SEC", "0.5"))
+RETRY_BUDGET_CAP = float(os.getenv("RETRY_BUDGET_CAP", "10"))
+
+
+class RetryBudget:
+    """
+    Global token bucket shared by retries and hedges.
+
+    Every original request deposits `ratio` tokens and the bucket also refills
+    slowly over time; every retry or hedge spends one token. During an outage
+    retries therefore stay a small fraction of traffic instead of multiplying it.
+    """
+
+    def __init__(self, ratio: float = RETRY_BUDGET_RATIO, min_per_second: float = RETRY_BUDGET_MIN_PER_SEC,
+                 cap: float = RETRY_BUDGET_CAP):
+        self.ratio = ratio
+        self.min_per_second = min_per_second
+        self.cap = cap
+        self.tokens = cap
+        self._last = time.monotonic()
+        self.exhausted = 0
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self.tokens = min(self.cap, self.tokens + (now - self._last) * self.min_per_second)
+        self._last = now
+
+    def deposit(self) -> None:
+        self._refill()
+        self.tokens = min(self.cap, self.tokens + self.ratio)
+
+    def try_spend(self) -> bool:
+        self._refill()
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return True
+        self.exhausted += 1
+        return False
+
+
+budget = RetryBudget()
+_counters = {"requests": 0, "retries": 0, "hedges": 0, "hedge_wins": 0}
+
+
+def _is_retryable(e: BaseException) -> bool:
+    # An open circuit is already a fast-fail; retrying it would only add latency
+    return isinstance(e, Exception) and not isinstance(e, CircuitOpenError) and is_upstream_failure(e)
+
+
+def _budget_stop(retry_state) -> bool:
+    if budget.try_spend():
+        _counters["retries"] += 1
+        return False
+    return True
+
+
+async def _hedged(factory, upstream: str, hedge=None):
+    """Run `factory()`; if it is slower than the upstream's p95, race a duplicate from `hedge()` (default: `factory`)."""
+    delay = latency.percentile(upstream, POLICY_HEDGE_PERCENTILE)
+    if delay is None:
+        return await factory()
+
+    first = asyncio.ensure_future(factory())
+    try:
+        done, _ = await asyncio.wait({first}, timeout=max(delay, POLICY_HEDGE_MIN_DELAY))
+    except asyncio.CancelledError:
+        first.cancel()
+        raise
+    if done or not budget.try_spend():
+        return await first
+
+    _counters["hedges"] += 1
+    second = asyncio.ensure_future((hedge or factory)())
+    pending = {first, second}
+    last_exc = None
+    try:
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                if task.exception() is None:
+                    if task is second:
+                        _counters["hedge_wins"] += 1
+                    return task.result()
+                last_exc = task.exception()
+        raise last_exc
+    finally:
+        for task in pending:
+            task.cancel()
+
+
+async def fetch_json(http, url: str, *, params: dict | None = None, timeout: float | None = None, upstream: str,
+                     rate=None):
+    """
+    Policy-wrapped GET for idempotent JSON endpoints.
+
+    - hedging: after the upstream's p95 latency, a duplicate request is sent and
+      whichever answers first wins (the other is cancelled);
+    - retries: retryable failures (timeouts, connection errors, 429/5xx) are
+      retried with capped, fully-jittered exponential backoff;
+    - both draw from one global RetryBudget so they cannot amplify an outage;
+    - with `rate` (a TokenBucket), every send, hedges and retries included,
+      takes a token first, so the upstream's request budget is honoured.
+    """
+    budget.deposit()
+    _counters["requests"] += 1
+
+    def factory():
+        return http.get_json(url, params=params, timeout=timeout, upstream=upstream)
+
+    async def paced():
+        await rate.acquire()
+        return await factory()
+
+    retrying = AsyncRetrying(
+        stop=stop_any(stop_after_attempt(POLICY_MAX_ATTEMPTS), _budget_stop),
+        wait=wait_random_exponential(multiplier=POLICY_BACKOFF_BASE, max=POLICY_BACKOFF_CAP),
+        retry=retry_if_exception(_is_retryable),
+        reraise=True,
+    )
+    async for attempt in retrying:
+        with attempt:
+            if rate is None:
+                result = await _hedged(factory, upstream)
+            else:
+                # Pace before starting the hedge clock, so waiting for a token doesn't trigger a hedge
+                await rate.acquire()
+                result = await _hedged(factory, upstream, hedge=paced)
+    return result
+
+
+def stats() -> dict:
+    return {**_counters, "budget_tokens": budget.tokens, "budget_exhausted": budget.exhausted}
+
+
+metrics.register("request_policy", stats)
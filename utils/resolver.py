@@ -0,0 +1,115 @@
+import os
+import time
+import socket
+import asyncio
+from collections import OrderedDict
+from typing import List
+from dotenv import load_dotenv
+
+from aiohttp.abc import AbstractResolver, ResolveResult
+
+from utils import metrics
+from utils.singleflight import SingleFlight
+
+# --- Configuration ---
+load_dotenv()
+DNS_CACHE_TTL_SECONDS = float(os.getenv("DNS_CACHE_TTL_SECONDS", os.getenv("HTTP_DNS_TTL_SECONDS", "300")))
+DNS_NEGATIVE_TTL_SECONDS = float(os.getenv("DNS_NEGATIVE_TTL_SECONDS", "30"))  # remember NXDOMAIN & co. briefly
+DNS_CACHE_MAX_ENTRIES = int(os.getenv("DNS_CACHE_MAX_ENTRIES", "1024"))
+
+
+class ResolutionCache:
+    """
+    Process-wide cache in front of `loop.getaddrinfo`.
+
+    getaddrinfo runs the blocking libc resolver on the default thread pool
+    and exposes no record TTLs, so answers are kept for a fixed TTL, failures
+    for a shorter negative TTL, and concurrent lookups of one name share a
+    single executor call. Entries are keyed by (host, family) without the
+    port; the requested port is filled into the returned sockaddrs.
+    """
+
+    def __init__(self, ttl: float = DNS_CACHE_TTL_SECONDS, negative_ttl: float = DNS_NEGATIVE_TTL_SECONDS,
+                 max_entries: int = DNS_CACHE_MAX_ENTRIES):
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self.max_entries = max_entries
+        # key -> (expires_at, infos or the gaierror to re-raise)
+        self._entries: OrderedDict[tuple, tuple[float, object]] = OrderedDict()
+        self._flight = SingleFlight()
+        self._counters = {"hits": 0, "negative_hits": 0, "misses": 0}
+
+    def cached(self, host: str, family: int = socket.AF_UNSPEC) -> bool:
+        entry = self._entries.get((host.lower(), family))
+        return entry is not None and entry[0] > time.monotonic()
+
+    async def _lookup(self, key: tuple) -> list:
+        host, family = key
+        loop = asyncio.get_running_loop()
+        try:
+            infos = await loop.getaddrinfo(host, None, family=family, type=socket.SOCK_STREAM)
+        except socket.gaierror as e:
+            self._store(key, self.negative_ttl, e)
+            raise
+        self._store(key, self.ttl, infos)
+        return infos
+
+    def _store(self, key: tuple, ttl: float, value) -> None:
+        self._entries[key] = (time.monotonic() + ttl, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    async def getaddrinfo(self, host: str, port: int = 0, family: int = socket.AF_UNSPEC) -> list:
+        """Drop-in for `loop.getaddrinfo(host, port, family=family, type=SOCK_STREAM)`."""
+        key = (host.lower(), family)
+        entry = self._entries.get(key)
+        if entry is not None and entry[0] > time.monotonic():
+            self._entries.move_to_end(key)
+            value = entry[1]
+            if isinstance(value, socket.gaierror):
+                self._counters["negative_hits"] += 1
+                raise socket.gaierror(*value.args)
+            self._counters["hits"] += 1
+            infos = value
+        else:
+            self._counters["misses"] += 1
+            infos = await self._flight.do(key, self._lookup, key)
+
+        return [
+            (fam, socktype, proto, canonname, (sockaddr[0], port, *sockaddr[2:]))
+            for fam, socktype, proto, canonname, sockaddr in infos
+        ]
+
+    def stats(self) -> dict:
+        return {**self._counters, "coalesced": self._flight.coalesced, "entries": len(self._entries)}
+
+
+class CachingResolver(AbstractResolver):
+    """aiohttp resolver backed by the shared ResolutionCache."""
+
+    def __init__(self, cache: "ResolutionCache | None" = None):
+        self.cache = cache or dns_cache
+
+    async def resolve(self, host: str, port: int = 0, family: socket.AddressFamily = socket.AF_INET) -> List[ResolveResult]:
+        infos = await self.cache.getaddrinfo(host, port, family=family)
+        if not infos:
+            raise OSError(None, f"DNS lookup failed for {host}")
+        return [
+            ResolveResult(
+                hostname=host,
+                host=sockaddr[0],
+                port=sockaddr[1],
+                family=fam,
+                proto=proto,
+                flags=socket.AI_NUMERICHOST | socket.AI_NUMERICSERV,
+            )
+            for fam, _socktype, proto, _canonname, sockaddr in infos
+        ]
+
+    async def close(self) -> None:
+        pass
+
+
+dns_cache = ResolutionCache()
+metrics.register("dns_cache", dns_cache.stats)
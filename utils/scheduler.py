@@ -0,0 +1,231 @@
+import os
+import time
+import asyncio
+from functools import partial
+from collections import OrderedDict, defaultdict, deque
+from concurrent.futures import ThreadPoolExecutor
+from dotenv import load_dotenv
+
+from utils import metrics
+
+# --- Configuration ---
+load_dotenv()
+SCHED_MODE = os.getenv("SCHED_MODE", "wfq")  # "wfq" (weighted-fair) or "rr" (round-robin)
+SCHED_MAX_CONCURRENCY = int(os.getenv("SCHED_MAX_CONCURRENCY", "8"))
+SCHED_PER_GUILD_INFLIGHT = int(os.getenv("SCHED_PER_GUILD_INFLIGHT", "2"))
+SCHED_MAX_QUEUE_PER_GUILD = int(os.getenv("SCHED_MAX_QUEUE_PER_GUILD", "10"))
+SCHED_STATS_MAX_TENANTS = int(os.getenv("SCHED_STATS_MAX_TENANTS", "256"))  # every DM user is a tenant
+
+
+class QueueFullError(Exception):
+    """Raised when a guild already has too much expensive work waiting."""
+
+
+def tenant_of(ctx) -> str:
+    """Scheduling key for a command context: the guild, or the user in DMs."""
+    guild = getattr(ctx, "guild", None)
+    if guild is not None:
+        return str(guild.id)
+    return f"dm:{ctx.author.id}"
+
+
+class FairScheduler:
+    """
+    Queues expensive command work per guild and hands out a bounded number of
+    global slots fairly between guilds.
+
+    - "rr" serves guilds with queued work in strict rotation.
+    - "wfq" serves the guild with the smallest virtual time; each dispatch
+      advances a guild's virtual time by 1/weight, so a guild with weight 2
+      gets roughly twice the slots of a guild with weight 1 under contention.
+
+    A guild never holds more than `per_guild_inflight` slots at once, so one
+    busy tenant cannot occupy the whole pool. Blocking calls go through the
+    scheduler's own thread pool instead of the loop's default executor.
+    """
+
+    def __init__(
+        self,
+        max_concurrency: int = SCHED_MAX_CONCURRENCY,
+        per_guild_inflight: int = SCHED_PER_GUILD_INFLIGHT,
+        max_queue_per_guild: int = SCHED_MAX_QUEUE_PER_GUILD,
+        mode: str = SCHED_MODE,
+        weights: dict | None = None,
+    ):
+        self.max_concurrency = max(1, max_concurrency)
+        self.per_guild_inflight = max(1, per_guild_inflight)
+        self.max_queue_per_guild = max(1, max_queue_per_guild)
+        self.mode = mode if mode in ("rr", "wfq") else "wfq"
+        self.weights = weights or {}
+
+        self._queues = defaultdict(deque)   # key -> deque[(future, enqueued_at)]
+        self._inflight = defaultdict(int)   # key -> running jobs
+        self._vtime = {}                    # key -> virtual time (wfq)
+        self._vclock = 0.0                  # virtual time of the last dispatch
+        self._rotation = deque()            # keys with queued work (rr)
+        self._running = 0
+
+        # key -> [served, rejected, wait_total], least recently active evicted first
+        self._tenant_stats: OrderedDict[str, list] = OrderedDict()
+        self._totals = {"served": 0, "rejected": 0}
+
+        self._executor = ThreadPoolExecutor(
+            max_workers=self.max_concurrency, thread_name_prefix="shunya-sched"
+        )
+
+    def set_weight(self, key: str, weight: float) -> None:
+        self.weights[key] = max(0.1, float(weight))
+
+    # --- Public API ---
+    async def run(self, key: str, func, *args, **kwargs):
+        """Await `func(*args, **kwargs)` once `key` gets a fair turn."""
+        await self._acquire(key)
+        try:
+            return await func(*args, **kwargs)
+        finally:
+            self._release(key)
+
+    async def run_blocking(self, key: str, func, *args, **kwargs):
+        """Run a blocking callable on the scheduler's thread pool under fair scheduling."""
+        loop = asyncio.get_running_loop()
+        return await self.run(key, loop.run_in_executor, self._executor, partial(func, *args, **kwargs))
+
+    def queue_depth(self, key: str) -> int:
+        return len(self._queues.get(key, ()))
+
+    def stats(self) -> dict:
+        keys = set(self._queues) | set(self._inflight) | set(self._tenant_stats)
+        guilds = {}
+        # Busiest tenants first; cap the listing so /stats stays readable
+        ordered = sorted(keys, key=lambda k: (self.queue_depth(k), self._inflight.get(k, 0)), reverse=True)
+        for key in ordered[:10]:
+            served, rejected, wait_total = self._tenant_stats.get(key, (0, 0, 0.0))
+            guilds[key] = {
+                "queued": self.queue_depth(key),
+                "inflight": self._inflight.get(key, 0),
+                "served": served,
+                "rejected": rejected,
+                "avg_wait_ms": (wait_total / served * 1000) if served else 0.0,
+            }
+        return {
+            "mode": self.mode,
+            "running": f"{self._running}/{self.max_concurrency}",
+            "queued_total": sum(len(q) for q in self._queues.values()),
+            "served_total": self._totals["served"],
+            "rejected_total": self._totals["rejected"],
+            "guilds": guilds,
+        }
+
+    # --- Internals ---
+    def _count(self, key: str, served: int = 0, rejected: int = 0, wait: float = 0.0) -> None:
+        stats = self._tenant_stats.get(key)
+        if stats is None:
+            stats = self._tenant_stats[key] = [0, 0, 0.0]
+            if len(self._tenant_stats) > SCHED_STATS_MAX_TENANTS:
+                self._tenant_stats.popitem(last=False)
+        else:
+            self._tenant_stats.move_to_end(key)
+        stats[0] += served
+        stats[1] += rejected
+        stats[2] += wait
+        self._totals["served"] += served
+        self._totals["rejected"] += rejected
+
+    async def _acquire(self, key: str) -> None:
+        queue = self._queues[key]
+        if len(queue) >= self.max_queue_per_guild:
+            self._count(key, rejected=1)
+            raise QueueFullError(f"Too many queued requests for this server ({len(queue)}).")
+
+        if not queue and self._inflight.get(key, 0) == 0:
+            # A guild coming back from idle must not cash in credit it "saved"
+            self._vtime[key] = max(self._vtime.get(key, 0.0), self._vclock)
+        if not queue:
+            self._rotation.append(key)
+
+        fut = asyncio.get_running_loop().create_future()
+        entry = (fut, time.monotonic())
+        queue.append(entry)
+        self._pump()
+
+        try:
+            await fut
+        except asyncio.CancelledError:
+            if fut.done() and not fut.cancelled():
+                # Slot was granted just before cancellation; hand it back
+                self._release(key)
+            else:
+                self._discard(key, entry)
+            raise
+
+    def _discard(self, key: str, entry) -> None:
+        queue = self._queues.get(key)
+        if queue is None:
+            return
+        try:
+            queue.remove(entry)
+        except ValueError:
+            pass
+        if not queue:
+            self._forget_queue(key)
+
+    def _forget_queue(self, key: str) -> None:
+        self._queues.pop(key, None)
+        try:
+            self._rotation.remove(key)
+        except ValueError:
+            pass
+        if not self._inflight.get(key):
+            self._inflight.pop(key, None)
+
+    def _eligible(self, key: str) -> bool:
+        return bool(self._queues.get(key)) and self._inflight.get(key, 0) < self.per_guild_inflight
+
+    def _pick(self) -> str | None:
+        if self.mode == "rr":
+            for _ in range(len(self._rotation)):
+                key = self._rotation[0]
+                self._rotation.rotate(-1)
+                if self._eligible(key):
+                    return key
+            return None
+
+        candidates = [k for k in self._queues if self._eligible(k)]
+        if not candidates:
+            return None
+        return min(candidates, key=lambda k: self._vtime.get(k, self._vclock))
+
+    def _pump(self) -> None:
+        while self._running < self.max_concurrency:
+            key = self._pick()
+            if key is None:
+                return
+
+            fut, enqueued_at = self._queues[key].popleft()
+            if not self._queues[key]:
+                self._forget_queue(key)
+            if fut.done():
+                # Waiter was cancelled but its _acquire hasn't run the cleanup yet; no slot for it
+                continue
+
+            self._running += 1
+            self._inflight[key] += 1
+            self._count(key, served=1, wait=time.monotonic() - enqueued_at)
+
+            vtime = self._vtime.get(key, self._vclock)
+            self._vclock = vtime
+            self._vtime[key] = vtime + 1.0 / self.weights.get(key, 1.0)
+
+            fut.set_result(None)
+
+    def _release(self, key: str) -> None:
+        self._running -= 1
+        self._inflight[key] -= 1
+        if self._inflight[key] <= 0 and not self._queues.get(key):
+            self._inflight.pop(key, None)
+        self._pump()
+
+
+# Single shared scheduler for all expensive commands
+scheduler = FairScheduler()
+metrics.register("scheduler", scheduler.stats)
@@ -0,0 +1,150 @@
+# cache.py
+import os
+import re
+import json
+import time
+import lmdb
+import asyncio
+from pathlib import Path
+from typing import Any, Awaitable, Callable, Dict, Tuple
+from dotenv import load_dotenv
+
+from utils import metrics
+from utils.singleflight import SingleFlight
+
+load_dotenv()
+
+# Path to the project root (adjust .parent levels if needed)
+PROJECT_ROOT = Path(__file__).resolve().parent.parent.parent
+DEFAULT_DIR = str(PROJECT_ROOT / "global_cache" / "shodan_cache")
+DEFAULT_MAP_SIZE = 64 * 1024 * 1024  # 64 MB
+SHODAN_CACHE_TTL_SECONDS = float(os.getenv("SHODAN_CACHE_TTL_SECONDS", "3600"))
+SHODAN_CACHE_STALE_SECONDS = float(os.getenv("SHODAN_CACHE_STALE_SECONDS", "86400"))
+
+TOKEN_RE = re.compile(r'(?:[^\s"]+|"[^"]*")+')  # keeps "quoted phrases" and title:"a b" whole
+FILTER_RE = re.compile(r"^(-?)([a-zA-Z_.]+):(.+)$")
+
+
+def normalize_query(query: str) -> str:
+    """
+    Canonical form of a Shodan query for cache keys: whitespace collapsed,
+    filter names lowercased and filters sorted after the free-text terms.
+    `nginx country:US port:80` and `port:80  nginx country:US` share a key.
+    """
+    terms, filters = [], []
+    for token in TOKEN_RE.findall(query):
+        m = FILTER_RE.match(token)
+        if m:
+            neg, name, value = m.groups()
+            filters.append(f"{neg}{name.lower()}:{value}")
+        else:
+            terms.append(token)
+    return " ".join(terms + sorted(filters))
+
+
+class ShodanCache:
+    """
+    Persistent Shodan response cache, one LMDB sub-database per kind of call.
+
+    Entries younger than `ttl` are served as-is. Until `ttl + stale` they are
+    still served immediately, and a background refresh replaces them
+    (stale-while-revalidate). Concurrent misses for one key share a single
+    upstream call, so a burst of identical queries spends credits once.
+    """
+
+    def __init__(self, path: str = DEFAULT_DIR, map_size: int = DEFAULT_MAP_SIZE,
+                 ttl: float = SHODAN_CACHE_TTL_SECONDS, stale: float = SHODAN_CACHE_STALE_SECONDS):
+        os.makedirs(path, exist_ok=True)
+        self.env = lmdb.open(
+            path,
+            map_size=map_size,
+            max_dbs=8,
+            subdir=True,
+            create=True,
+            lock=True,
+            readahead=False,
+        )
+        self.ttl = ttl
+        self.stale = stale
+        self._dbs: Dict[str, Any] = {}
+        self._flight = SingleFlight()
+        self._background: set[asyncio.Task] = set()
+        self._counters = {"hits": 0, "stale_hits": 0, "misses": 0, "refresh_errors": 0}
+        metrics.register("shodan_cache", self.stats)
+
+    def close(self):
+        for task in self._background:
+            task.cancel()
+        self.env.close()
+
+    def _db(self, kind: str):
+        db = self._dbs.get(kind)
+        if db is None:
+            db = self._dbs[kind] = self.env.open_db(kind.encode("utf-8"))
+        return db
+
+    def _read(self, kind: str, key: str) -> Dict[str, Any] | None:
+        with self.env.begin(db=self._db(kind)) as txn:
+            raw = txn.get(key.encode("utf-8"))
+        if not raw:
+            return None
+        try:
+            return json.loads(raw.decode("utf-8"))
+        except Exception:
+            return None
+
+    def _write(self, kind: str, key: str, data: Any) -> None:
+        payload = json.dumps({"stored_at": time.time(), "data": data}, separators=(",", ":")).encode("utf-8")
+        db = self._db(kind)
+        try:
+            with self.env.begin(write=True, db=db) as txn:
+                txn.put(key.encode("utf-8"), payload)
+        except lmdb.MapFullError:
+            # Everything here is re-fetchable: start this kind over rather than fail the command
+            with self.env.begin(write=True) as txn:
+                txn.drop(db, delete=False)
+            with self.env.begin(write=True, db=db) as txn:
+                txn.put(key.encode("utf-8"), payload)
+
+    async def _load(self, kind: str, key: str, loader: Callable[[], Awaitable[Any]]) -> Any:
+        data = await loader()
+        self._write(kind, key, data)
+        return data
+
+    def _revalidate(self, kind: str, key: str, loader: Callable[[], Awaitable[Any]]) -> None:
+        if (kind, key) in self._flight:
+            return
+
+        async def refresh():
+            try:
+                await self._flight.do((kind, key), self._load, kind, key, loader)
+            except Exception as e:
+                self._counters["refresh_errors"] += 1
+                print(f"[ShodanCache] background refresh failed for {kind}:{key}: {e}")
+
+        task = asyncio.create_task(refresh())
+        self._background.add(task)
+        task.add_done_callback(self._background.discard)
+
+    async def get_or_fetch(self, kind: str, key: str, loader: Callable[[], Awaitable[Any]]) -> Tuple[Any, float]:
+        """
+        Return (data, age_seconds) for `key`, calling `loader()` only on a miss
+        or an expired entry. Stale entries are returned with their real age.
+        """
+        entry = self._read(kind, key)
+        if entry is not None:
+            age = time.time() - entry.get("stored_at", 0)
+            if age < self.ttl:
+                self._counters["hits"] += 1
+                return entry["data"], age
+            if age < self.ttl + self.stale:
+                self._counters["stale_hits"] += 1
+                self._revalidate(kind, key, loader)
+                return entry["data"], age
+
+        self._counters["misses"] += 1
+        data = await self._flight.do((kind, key), self._load, kind, key, loader)
+        return data, 0.0
+
+    def stats(self) -> dict:
+        return {**self._counters, "coalesced": self._flight.coalesced, "refreshing": len(self._background)}
@@ -0,0 +1,98 @@
+# client.py
+import os
+import json
+import shodan
+from dotenv import load_dotenv
+
+from utils.http_client import UpstreamError
+from utils.rate_limit import TokenBucket
+
+load_dotenv()
+
+SHODAN_API_URL = "https://api.shodan.io"
+SHODAN_RPS = float(os.getenv("SHODAN_RPS", "1"))      # Shodan allows ~1 request/second per key
+SHODAN_BURST = float(os.getenv("SHODAN_BURST", "1"))  # raise only if your plan tolerates back-to-back calls
+PAGE_SIZE = 100  # matches per search page; pages after the first cost a query credit
+
+
+class AsyncShodan:
+    """
+    Minimal async Shodan REST client on top of the bot's shared HttpClient.
+
+    Mirrors the parts of `shodan.Shodan` the bot uses, but without the extra
+    thread hop and with pooled keep-alive connections. Errors are raised as
+    `shodan.APIError` so existing error handling keeps working.
+    """
+
+    def __init__(self, http, api_key: str):
+        self.http = http
+        self.api_key = api_key
+        self.budget = TokenBucket(SHODAN_RPS, SHODAN_BURST)
+
+    async def _get(self, path: str, params: dict | None = None) -> dict:
+        query = {"key": self.api_key}
+        if params:
+            query.update({k: v for k, v in params.items() if v is not None})
+
+        await self.budget.acquire()
+        try:
+            data = await self.http.get_json(
+                f"{SHODAN_API_URL}{path}", params=query, upstream="shodan"
+            )
+        except UpstreamError as e:
+            raise shodan.APIError(self._error_message(e)) from e
+
+        if isinstance(data, dict) and "error" in data:
+            raise shodan.APIError(data["error"])
+        return data
+
+    @staticmethod
+    def _error_message(e: UpstreamError) -> str:
+        if e.status == 401:
+            return "Invalid API key"
+        try:
+            return json.loads(e.body).get("error") or f"HTTP {e.status}"
+        except Exception:
+            return f"HTTP {e.status}"
+
+    async def search(self, query: str, page: int = 1, limit: int | None = None, minify: bool = True) -> dict:
+        """Same result shape as `shodan.Shodan.search`: {"total": int, "matches": [...]}"""
+        params = {"query": query, "minify": str(minify).lower()}
+        if limit:
+            params["limit"] = limit
+        else:
+            params["page"] = page
+        data = await self._get("/shodan/host/search", params)
+        if limit:
+            data["matches"] = data.get("matches", [])[:limit]
+        return data
+
+    async def search_cursor(self, query: str, max_results: int, minify: bool = True):
+        """
+        Async counterpart of `shodan.Shodan.search_cursor`: yields one page of
+        matches at a time until `max_results`, the last page, or an empty page.
+        Only the current page is ever held in memory.
+        """
+        page = 1
+        remaining = max_results
+        while remaining > 0:
+            data = await self.search(query, page=page, minify=minify)
+            matches = data.get("matches", [])[:remaining]
+            if not matches:
+                return
+            remaining -= len(matches)
+            yield data.get("total", 0), matches
+            if len(data.get("matches", [])) < PAGE_SIZE:
+                return
+            page += 1
+
+    async def count(self, query: str, facets: str | None = None) -> dict:
+        """
+        Same shape as `shodan.Shodan.count`: {"total": int, "facets": {name: [{"value", "count"}]}}.
+        Counting does not spend query credits.
+        """
+        return await self._get("/shodan/host/count", {"query": query, "facets": facets})
+
+    async def host(self, ip: str, minify: bool = True) -> dict:
+        """Same shape as `shodan.Shodan.host`; minified records omit the per-service banners."""
+        return await self._get(f"/shodan/host/{ip}", {"minify": str(minify).lower()})
@@ -0,0 +1,80 @@
+# export.py
+import csv
+import xlsxwriter
+from typing import Any, Callable, Dict, Iterable, List, Tuple
+
+# (header, extractor) per column; every value is flattened to a str/int cell
+EXPORT_COLUMNS: List[Tuple[str, Callable[[Dict[str, Any]], Any]]] = [
+    ("ip", lambda m: m.get("ip_str", "")),
+    ("port", lambda m: m.get("port", "")),
+    ("transport", lambda m: m.get("transport", "")),
+    ("product", lambda m: m.get("product", "")),
+    ("version", lambda m: m.get("version", "")),
+    ("org", lambda m: m.get("org", "")),
+    ("asn", lambda m: m.get("asn", "")),
+    ("country", lambda m: (m.get("location") or {}).get("country_name", "")),
+    ("city", lambda m: (m.get("location") or {}).get("city", "")),
+    ("hostnames", lambda m: ", ".join(m.get("hostnames") or [])),
+    ("domains", lambda m: ", ".join(m.get("domains") or [])),
+    ("os", lambda m: m.get("os", "")),
+    ("tags", lambda m: ", ".join(m.get("tags") or [])),
+    ("vulns", lambda m: ", ".join(m.get("vulns") or {}) if isinstance(m.get("vulns"), dict) else ""),
+    ("timestamp", lambda m: m.get("timestamp", "")),
+]
+
+# Spreadsheet apps treat cells starting with these as formulas
+FORMULA_PREFIXES = ("=", "+", "-", "@", "\t", "\r")
+
+
+def _cell(value: Any) -> Any:
+    """Banners, titles and hostnames are attacker-controlled; never let them become formulas."""
+    if value is None:
+        return ""
+    if isinstance(value, str) and value.startswith(FORMULA_PREFIXES):
+        return "'" + value
+    return value
+
+
+class ResultWriter:
+    """
+    Row-at-a-time writer for Shodan matches, to a CSV or XLSX file on disk.
+    XLSX uses xlsxwriter's constant_memory mode, which flushes each row as it
+    is written, so memory stays flat however many pages are exported.
+    Methods block on file I/O; call them from an executor.
+    """
+
+    def __init__(self, path: str, fmt: str = "xlsx"):
+        self.fmt = fmt
+        self.rows = 0
+        headers = [name for name, _ in EXPORT_COLUMNS]
+        if fmt == "csv":
+            self._file = open(path, "w", newline="", encoding="utf-8")
+            self._csv = csv.writer(self._file)
+            self._csv.writerow(headers)
+        else:
+            self._book = xlsxwriter.Workbook(path, {
+                "constant_memory": True,
+                "strings_to_urls": False,
+                "strings_to_formulas": False,
+            })
+            self._sheet = self._book.add_worksheet("results")
+            self._sheet.write_row(0, 0, headers, self._book.add_format({"bold": True}))
+            self._sheet.freeze_panes(1, 0)
+
+    def write_matches(self, matches: Iterable[Dict[str, Any]]) -> int:
+        written = 0
+        for match in matches:
+            row = [_cell(extract(match)) for _, extract in EXPORT_COLUMNS]
+            if self.fmt == "csv":
+                self._csv.writerow(row)
+            else:
+                self._sheet.write_row(self.rows + 1, 0, row)
+            self.rows += 1
+            written += 1
+        return written
+
+    def close(self) -> None:
+        if self.fmt == "csv":
+            self._file.close()
+        else:
+            self._book.close()
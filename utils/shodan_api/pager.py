@@ -0,0 +1,143 @@
+# pager.py
+import discord
+from typing import Any, Awaitable, Callable, Dict, List
+
+from utils.shodan_api.client import PAGE_SIZE
+
+BANNER_KEEP = 300  # chars of banner kept per cached match; one line is shown
+
+
+def slim_match(match: Dict[str, Any]) -> Dict[str, Any]:
+    """Keep only what a result page renders, so cached pages stay small."""
+    slim = {k: match.get(k) for k in (
+        "ip_str", "port", "transport", "org", "asn", "os", "hostnames",
+        "product", "version", "tags", "timestamp", "location",
+    )}
+    vulns = match.get("vulns")
+    slim["vulns"] = list(vulns)[:10] if isinstance(vulns, dict) else []
+    slim["data"] = (match.get("data") or "")[:BANNER_KEEP]
+    return slim
+
+
+def build_host_embed(match: Dict[str, Any], query: str, position: int, total: int) -> discord.Embed:
+    ip_str = match.get("ip_str", "unknown IP")
+    port = match.get("port", "?")
+    transport = (match.get("transport") or "").upper()
+
+    location = match.get("location") or {}
+    city = location.get("city") or "Unknown city"
+    country = location.get("country_name") or "N/A"
+
+    product = match.get("product") or "Unknown service"
+    version = match.get("version")
+    hostnames = ", ".join((match.get("hostnames") or [])[:3]) or "None"
+    tags = ", ".join((match.get("tags") or [])[:5]) or "None"
+    vulns = ", ".join((match.get("vulns") or [])[:3]) or "None"
+
+    embed = discord.Embed(
+        title=f"{ip_str}:{port} {transport}".strip(),
+        description=f"Query: `{query}`",
+        color=discord.Color.dark_red(),
+    )
+    embed.add_field(name="Service", value=product + (f" {version}" if version else ""), inline=True)
+    embed.add_field(name="Location", value=f"{city}, {country}", inline=True)
+    embed.add_field(name="Org/ASN", value=f"{match.get('org') or 'N/A'} / {match.get('asn') or 'N/A'}", inline=True)
+    embed.add_field(name="OS", value=match.get("os") or "Unknown OS", inline=True)
+    embed.add_field(name="Hostnames", value=hostnames, inline=True)
+    embed.add_field(name="Tags", value=tags, inline=True)
+    embed.add_field(name="Vulns", value=vulns, inline=False)
+
+    banner = (match.get("data") or "").strip()
+    if banner:
+        first_line = banner.splitlines()[0][:140].replace("`", "´")
+        embed.add_field(name="Banner", value=f"`{first_line}`", inline=False)
+
+    embed.set_footer(text=f"Result {position + 1} of ~{total:,} • Last seen {match.get('timestamp') or 'N/A'}")
+    return embed
+
+
+class ResultPager(discord.ui.View):
+    """
+    One Shodan host per page. Embeds are built only for the page being shown,
+    and the next 100-match Shodan page is fetched only when the reader steps
+    past the ones already loaded.
+    """
+
+    def __init__(self, query: str, first_page: List[Dict[str, Any]], total: int,
+                 fetch_page: Callable[[int], Awaitable[List[Dict[str, Any]]]],
+                 author_id: int, timeout: float = 300):
+        super().__init__(timeout=timeout)
+        self.query = query
+        self.total = total
+        self.fetch_page = fetch_page
+        self.author_id = author_id
+        self.pages: Dict[int, List[Dict[str, Any]]] = {1: first_page}
+        self.position = 0
+        self.message: discord.Message | None = None
+        self._sync_buttons()
+
+    def _loaded(self, position: int) -> Dict[str, Any] | None:
+        page = self.pages.get(position // PAGE_SIZE + 1)
+        offset = position % PAGE_SIZE
+        return page[offset] if page is not None and offset < len(page) else None
+
+    def _has_next(self) -> bool:
+        nxt = self.position + 1
+        if nxt >= self.total:
+            return False
+        page_no = nxt // PAGE_SIZE + 1
+        # A loaded page that came back short means Shodan has nothing beyond it
+        return page_no not in self.pages or nxt % PAGE_SIZE < len(self.pages[page_no])
+
+    def _sync_buttons(self) -> None:
+        self.prev_button.disabled = self.position == 0
+        self.next_button.disabled = not self._has_next()
+
+    def current_embed(self) -> discord.Embed:
+        return build_host_embed(self._loaded(self.position), self.query, self.position, self.total)
+
+    async def interaction_check(self, interaction: discord.Interaction) -> bool:
+        if interaction.user.id != self.author_id:
+            await interaction.response.send_message("Run your own `/shodan` search to page through results.", ephemeral=True)
+            return False
+        return True
+
+    async def _show(self, interaction: discord.Interaction, position: int) -> None:
+        if self._loaded(position) is None:
+            # Shodan calls can outlast the 3 s interaction deadline
+            await interaction.response.defer()
+            page_no = position // PAGE_SIZE + 1
+            try:
+                self.pages[page_no] = await self.fetch_page(page_no)
+            except Exception as e:
+                print(f"[Shodan pager] page {page_no} failed: {type(e).__name__}: {e}")
+                await interaction.followup.send("Could not load more Shodan results right now.", ephemeral=True)
+                return
+            if self._loaded(position) is None:
+                self.total = position  # ran out earlier than `total` promised
+            else:
+                self.position = position
+            self._sync_buttons()
+            await interaction.edit_original_response(embed=self.current_embed(), view=self)
+            return
+
+        self.position = position
+        self._sync_buttons()
+        await interaction.response.edit_message(embed=self.current_embed(), view=self)
+
+    @discord.ui.button(label="◀ Prev", style=discord.ButtonStyle.secondary)
+    async def prev_button(self, interaction: discord.Interaction, button: discord.ui.Button):
+        await self._show(interaction, self.position - 1)
+
+    @discord.ui.button(label="Next ▶", style=discord.ButtonStyle.secondary)
+    async def next_button(self, interaction: discord.Interaction, button: discord.ui.Button):
+        await self._show(interaction, self.position + 1)
+
+    async def on_timeout(self) -> None:
+        for item in self.children:
+            item.disabled = True
+        if self.message is not None:
+            try:
+                await self.message.edit(view=self)
+            except discord.HTTPException:
+                pass
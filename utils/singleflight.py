@@ -0,0 +1,43 @@
+import asyncio
+from typing import Any, Awaitable, Callable, Dict, Hashable
+
+
+class SingleFlight:
+    """
+    Coalesce concurrent calls for the same key: the first caller runs the
+    work, everyone arriving while it is in flight awaits the same result (or
+    exception). Nothing is cached once the call finishes.
+    """
+
+    def __init__(self):
+        self._inflight: Dict[Hashable, asyncio.Future] = {}
+        self.coalesced = 0
+
+    def __contains__(self, key: Hashable) -> bool:
+        return key in self._inflight
+
+    async def do(self, key: Hashable, func: Callable[..., Awaitable[Any]], *args, **kwargs) -> Any:
+        fut = self._inflight.get(key)
+        if fut is not None:
+            self.coalesced += 1
+            # shield: one waiter being cancelled must not cancel the shared call
+            return await asyncio.shield(fut)
+
+        fut = asyncio.get_running_loop().create_future()
+        self._inflight[key] = fut
+        try:
+            result = await func(*args, **kwargs)
+        except asyncio.CancelledError:
+            # Followers were not cancelled themselves; give them an error their handlers can catch
+            fut.set_exception(RuntimeError("coalesced call was cancelled"))
+            fut.exception()
+            raise
+        except BaseException as e:
+            fut.set_exception(e)
+            fut.exception()  # mark retrieved when nobody else was waiting
+            raise
+        else:
+            fut.set_result(result)
+            return result
+        finally:
+            self._inflight.pop(key, None)
@@ -1,45 +1,67 @@
 # tarot_cache.py
 import os
 import json
+import time
 import lmdb
-import requests
+import hashlib
 import datetime
 from pathlib import Path
 from typing import List, Dict, Any
 
+from utils.request_policy import fetch_json
+
 
 # Path to the project root (adjust .parent levels if needed)
 PROJECT_ROOT = Path(__file__).resolve().parent.parent.parent  # e.g. file is in utils/, project root is two levels up
 DEFAULT_DIR = str(PROJECT_ROOT / "global_cache" / "tarot_cache")
-TAROT_API = "https://tarotapi.dev/api/v1/cards/random?n=3"
+TAROT_DECK_API = "https://tarotapi.dev/api/v1/cards"  # full 78-card deck, fetched once
 DEFAULT_MAP_SIZE = 10 * 1024 * 1024  # 10 MB
+DECK_KEY = b"deck"
+DECK_SIZE = 78
+CARDS_PER_DRAW = 3
+DAY_PREFIX = b"day:"       # per-day sub-databases: day:YYYY-MM-DD
+LEGACY_DB = b"cards"       # old single sub-db with "date:user" keys
 
 class TarotStore:
-    def __init__(self, path: str = DEFAULT_DIR, map_size: int = DEFAULT_MAP_SIZE, db_name: str = "cards"):
+    """
+    Draws live in one LMDB sub-database per local day, keyed by the raw user
+    id. Rolling over to a new day drops the previous day's whole sub-database
+    at once instead of deleting its keys one by one.
+    """
+
+    def __init__(self, path: str = DEFAULT_DIR, map_size: int = DEFAULT_MAP_SIZE,
+                 tzinfo: datetime.tzinfo = datetime.timezone.utc):
         os.makedirs(path, exist_ok=True)
+        self.tzinfo = tzinfo
         self.env = lmdb.open(
             path,
             map_size=map_size,
-            max_dbs=2,
+            max_dbs=8,  # deck + today + a few stale days awaiting drop
             subdir=True,
             create=True,
             lock=True,
             readahead=False,  # small random I/O
+            # Draws are recomputable from (user, date), so losing the last few
+            # writes on a crash is harmless; skip the fsync on every first draw
+            sync=False,
+            metasync=False,
         )
-        self.db = self.env.open_db(db_name.encode("utf-8"))
+        self.deck_db = self.env.open_db(b"deck")
+        self.deck: List[Dict[str, Any]] | None = self._load_deck()
+
+        self._day: str | None = None
+        self._day_db = None
+        self._rollover_at = 0.0  # epoch seconds of the next local midnight
+        self.rollover()
 
     def close(self):
+        self.env.sync(True)
         self.env.close()
 
-    @staticmethod
-    def _today_key(user_id: int, tzinfo: datetime.tzinfo) -> bytes:
-        today = datetime.datetime.now(tzinfo).date().isoformat()
-        return f"{today}:{user_id}".encode("utf-8")
-
-    def get_cached_cards(self, user_id: int, tzinfo: datetime.tzinfo) -> List[Dict[str, Any]] | None:
-        key = self._today_key(user_id, tzinfo)
-        with self.env.begin(db=self.db) as txn:
-            raw = txn.get(key)
+    # --- Deck ---
+    def _load_deck(self) -> List[Dict[str, Any]] | None:
+        with self.env.begin(db=self.deck_db) as txn:
+            raw = txn.get(DECK_KEY)
         if not raw:
             return None
         try:
@@ -47,33 +69,101 @@ class TarotStore:
         except Exception:
             return None
 
-    def _fetch_three_cards(self, timeout: float = 10.0) -> List[Dict[str, Any]]:
-        # Raises requests exceptions on failure; caller handles
-        resp = requests.get(TAROT_API, timeout=timeout)
-        resp.raise_for_status()
-        data = resp.json()
+    async def ensure_deck(self, http) -> None:
+        """Fetch the full deck once and keep it in LMDB; no-op when already stored."""
+        if self.deck:
+            return
+        data = await fetch_json(http, TAROT_DECK_API, upstream="tarotapi")
         cards = data.get("cards", [])
-        if not isinstance(cards, list) or len(cards) == 0:
-            raise ValueError("Empty or invalid cards payload")
-        return cards[:3]
+        if not isinstance(cards, list) or len(cards) < DECK_SIZE:
+            raise ValueError("Empty or incomplete deck payload")
+
+        # Stable order so every shard maps the same index to the same card
+        cards = sorted(cards, key=lambda c: c.get("name_short", c.get("name", "")))
+        payload = json.dumps(cards, separators=(",", ":")).encode("utf-8")
+        with self.env.begin(write=True, db=self.deck_db) as txn:
+            txn.put(DECK_KEY, payload)
+        self.deck = cards
+
+    @staticmethod
+    def _draw_indices(user_id: int, day: str, deck_size: int, k: int = CARDS_PER_DRAW) -> List[int]:
+        """
+        Deterministic partial Fisher-Yates shuffle driven by SHA-256 of (day, user).
+        Pure hashing (no `random` module state) keeps results identical across
+        processes, shards and Python versions.
+        """
+        seed = f"{day}:{user_id}".encode("utf-8")
+        order = list(range(deck_size))
+        for i in range(k):
+            h = hashlib.sha256(seed + i.to_bytes(1, "big")).digest()
+            j = i + int.from_bytes(h[:8], "big") % (deck_size - i)
+            order[i], order[j] = order[j], order[i]
+        return order[:k]
+
+    def draw_cards(self, user_id: int, day: str) -> List[Dict[str, Any]]:
+        if not self.deck:
+            raise RuntimeError("Tarot deck is not loaded yet")
+        return [self.deck[i] for i in self._draw_indices(user_id, day, len(self.deck))]
+
+    # --- Per-day partitions ---
+    def _current_day_db(self):
+        # A float comparison on the hot path; the date string is only built at midnight
+        if time.time() >= self._rollover_at:
+            self._switch_day()
+        return self._day_db
+
+    def _switch_day(self) -> None:
+        now = datetime.datetime.now(self.tzinfo)
+        next_midnight = datetime.datetime.combine(
+            now.date() + datetime.timedelta(days=1), datetime.time(0, 0), tzinfo=self.tzinfo
+        )
+        self._day = now.date().isoformat()
+        self._day_db = self.env.open_db(DAY_PREFIX + self._day.encode("utf-8"))
+        self._rollover_at = next_midnight.timestamp()
+
+    def rollover(self) -> int:
+        """
+        Switch to today's partition and drop every other day's sub-database
+        (plus the legacy flat one). Returns the number of partitions dropped.
+        """
+        self._switch_day()
+        current = DAY_PREFIX + self._day.encode("utf-8")
 
-    def get_or_create_today_cards(self, user_id: int, tzinfo: datetime.tzinfo) -> List[Dict[str, Any]]:
-        cached = self.get_cached_cards(user_id, tzinfo)
+        with self.env.begin() as txn:
+            stale = [
+                key for key, _ in txn.cursor()
+                if (key.startswith(DAY_PREFIX) and key != current) or key == LEGACY_DB
+            ]
+
+        for name in stale:
+            db = self.env.open_db(name)
+            with self.env.begin(write=True) as txn:
+                txn.drop(db, delete=True)
+        return len(stale)
+
+    # --- Per-user daily draws ---
+    @staticmethod
+    def _user_key(user_id: int) -> bytes:
+        return user_id.to_bytes(8, "big")
+
+    def get_cached_cards(self, user_id: int) -> List[Dict[str, Any]] | None:
+        db = self._current_day_db()
+        with self.env.begin(db=db) as txn:
+            raw = txn.get(self._user_key(user_id))
+        if not raw:
+            return None
+        try:
+            return json.loads(raw.decode("utf-8"))
+        except Exception:
+            return None
+
+    def get_or_create_today_cards(self, user_id: int) -> List[Dict[str, Any]]:
+        cached = self.get_cached_cards(user_id)
         if cached:
             return cached
-        cards = self._fetch_three_cards()
+        cards = self.draw_cards(user_id, self._day)
+        # Stored so a user's draw stays pinned even if the deck is ever re-fetched
         payload = json.dumps(cards, separators=(",", ":")).encode("utf-8")
-        key = self._today_key(user_id, tzinfo)
-        with self.env.begin(write=True, db=self.db) as txn:
-            txn.put(key, payload)
+        with self.env.begin(write=True, db=self._day_db) as txn:
+            txn.put(self._user_key(user_id), payload)
         return cards
-
-    def clear_all(self):
-        # Remove all keys in the sub-db (daily scheduled)
-        with self.env.begin(write=True, db=self.db) as txn:
-            with txn.cursor() as cur:
-                if cur.first():
-                    do_delete = True
-                    while do_delete:
-                        cur.delete()
-                        do_delete = cur.next()
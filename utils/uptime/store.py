@@ -0,0 +1,180 @@
+# store.py
+import os
+import json
+import time
+import lmdb
+import struct
+from array import array
+from bisect import bisect_left
+from pathlib import Path
+from typing import Any, Dict, List
+
+# Path to the project root (adjust .parent levels if needed)
+PROJECT_ROOT = Path(__file__).resolve().parent.parent.parent
+DEFAULT_DIR = str(PROJECT_ROOT / "global_cache" / "uptime_store")
+DEFAULT_MAP_SIZE = 128 * 1024 * 1024  # 128 MB
+
+SAMPLE = struct.Struct("<If")  # (unix ts, latency ms; < 0 means down) = 8 bytes
+RAW_CHUNK = 3600               # raw samples are appended to one value per endpoint-hour
+RAW_KEEP = 2 * 86400
+M5 = 300
+M5_KEEP = 2 * 86400
+H1 = 3600
+H1_KEEP = 30 * 86400
+
+# Latency histogram upper bounds (ms); the last bucket is open-ended
+HIST_BOUNDS = (5, 10, 20, 30, 50, 75, 100, 150, 200, 300, 500, 750, 1000, 1500, 2000)
+# Rollup value layout, uint32: [samples, up, latency_sum_ms, *histogram]
+ROLLUP_LEN = 3 + len(HIST_BOUNDS) + 1
+
+
+def _bucket_key(endpoint: str, start: int) -> bytes:
+    # Big-endian start keeps one endpoint's buckets contiguous and time-ordered
+    return endpoint.encode("utf-8") + b"|" + start.to_bytes(4, "big")
+
+
+def _empty_rollup() -> array:
+    return array("I", [0] * ROLLUP_LEN)
+
+
+class UptimeStore:
+    """
+    Probe samples for monitored endpoints.
+
+    Raw samples are packed 8 bytes each and appended to one LMDB value per
+    endpoint-hour. Every write also folds the sample into 5-minute and hourly
+    rollups (count, up, latency sum and a fixed histogram), so availability
+    and percentiles over 1h/24h/7d are read from at most 168 small records.
+    """
+
+    def __init__(self, path: str = DEFAULT_DIR, map_size: int = DEFAULT_MAP_SIZE):
+        os.makedirs(path, exist_ok=True)
+        self.env = lmdb.open(
+            path,
+            map_size=map_size,
+            max_dbs=4,
+            subdir=True,
+            create=True,
+            lock=True,
+            readahead=False,
+        )
+        self.endpoints_db = self.env.open_db(b"endpoints")
+        self.raw_db = self.env.open_db(b"raw")
+        self.m5_db = self.env.open_db(b"m5")
+        self.h1_db = self.env.open_db(b"h1")
+
+    def close(self):
+        self.env.close()
+
+    # --- Registrations ---
+    def get_endpoint(self, endpoint: str) -> Dict[str, Any] | None:
+        with self.env.begin(db=self.endpoints_db) as txn:
+            raw = txn.get(endpoint.encode("utf-8"))
+        return json.loads(raw.decode("utf-8")) if raw else None
+
+    def put_endpoint(self, endpoint: str, entry: Dict[str, Any]) -> None:
+        payload = json.dumps(entry, separators=(",", ":")).encode("utf-8")
+        with self.env.begin(write=True, db=self.endpoints_db) as txn:
+            txn.put(endpoint.encode("utf-8"), payload)
+
+    def delete_endpoint(self, endpoint: str) -> None:
+        with self.env.begin(write=True, db=self.endpoints_db) as txn:
+            txn.delete(endpoint.encode("utf-8"))
+
+    def endpoints(self) -> Dict[str, Dict[str, Any]]:
+        with self.env.begin(db=self.endpoints_db) as txn:
+            return {k.decode("utf-8"): json.loads(v.decode("utf-8")) for k, v in txn.cursor()}
+
+    # --- Samples ---
+    def record(self, endpoint: str, ts: float, latency_ms: float | None) -> None:
+        """Append one sample (None = down) and update its rollups in the same transaction."""
+        ts = int(ts)
+        up = latency_ms is not None
+        value = float(latency_ms) if up else -1.0
+        with self.env.begin(write=True) as txn:
+            raw_key = _bucket_key(endpoint, ts - ts % RAW_CHUNK)
+            txn.put(raw_key, (txn.get(raw_key, db=self.raw_db) or b"") + SAMPLE.pack(ts, value), db=self.raw_db)
+            for db, width in ((self.m5_db, M5), (self.h1_db, H1)):
+                key = _bucket_key(endpoint, ts - ts % width)
+                packed = txn.get(key, db=db)
+                rollup = array("I", packed) if packed else _empty_rollup()
+                rollup[0] += 1
+                if up:
+                    rollup[1] += 1
+                    rollup[2] += int(round(value))
+                    rollup[3 + bisect_left(HIST_BOUNDS, value)] += 1
+                txn.put(key, rollup.tobytes(), db=db)
+
+    def raw_samples(self, endpoint: str, since: float) -> List[tuple[int, float]]:
+        since = int(since)
+        out = []
+        with self.env.begin(db=self.raw_db) as txn:
+            cursor = txn.cursor()
+            if cursor.set_range(_bucket_key(endpoint, since - since % RAW_CHUNK)):
+                prefix = endpoint.encode("utf-8") + b"|"
+                for key, value in cursor:
+                    if not key.startswith(prefix):
+                        break
+                    out.extend(s for s in SAMPLE.iter_unpack(value) if s[0] >= since)
+        return out
+
+    def summary(self, endpoint: str, window_seconds: int, now: float | None = None) -> Dict[str, Any]:
+        """
+        Availability and latency percentiles over the last `window_seconds`,
+        merged from 5-minute rollups for windows up to 2 h, hourly ones beyond.
+        """
+        now = int(now if now is not None else time.time())
+        db, width = (self.m5_db, M5) if window_seconds <= 2 * H1 else (self.h1_db, H1)
+        first = now - window_seconds
+        first -= first % width
+
+        total = _empty_rollup()
+        prefix = endpoint.encode("utf-8") + b"|"
+        with self.env.begin(db=db) as txn:
+            cursor = txn.cursor()
+            if cursor.set_range(_bucket_key(endpoint, first)):
+                for key, value in cursor:
+                    if not key.startswith(prefix):
+                        break
+                    for i, v in enumerate(array("I", value)):
+                        total[i] += v
+
+        samples, up, latency_sum = total[0], total[1], total[2]
+        hist = total[3:]
+        return {
+            "samples": samples,
+            "availability": up / samples if samples else None,
+            "avg_ms": latency_sum / up if up else None,
+            "p50_ms": self._percentile(hist, up, 0.50),
+            "p95_ms": self._percentile(hist, up, 0.95),
+            "p99_ms": self._percentile(hist, up, 0.99),
+        }
+
+    @staticmethod
+    def _percentile(hist, count: int, q: float) -> float | None:
+        """Upper bound of the histogram bucket holding the q-quantile (inf for the open bucket)."""
+        if not count:
+            return None
+        rank = q * count
+        seen = 0
+        for i, n in enumerate(hist):
+            seen += n
+            if seen >= rank:
+                return float(HIST_BOUNDS[i]) if i < len(HIST_BOUNDS) else float("inf")
+        return float("inf")
+
+    # --- Retention ---
+    def prune(self, now: float | None = None) -> int:
+        """Delete raw and rollup buckets past their retention. Returns keys removed."""
+        now = int(now if now is not None else time.time())
+        removed = 0
+        with self.env.begin(write=True) as txn:
+            for db, keep in ((self.raw_db, RAW_KEEP), (self.m5_db, M5_KEEP), (self.h1_db, H1_KEEP)):
+                cutoff = now - keep
+                cursor = txn.cursor(db=db)
+                stale = [key for key in cursor.iternext(values=False)
+                         if int.from_bytes(key[-4:], "big") < cutoff]
+                for key in stale:
+                    txn.delete(key, db=db)
+                removed += len(stale)
+        return removed